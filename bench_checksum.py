@@ -0,0 +1,76 @@
+import argparse
+import random
+import timeit
+
+from ubx_gps_simulator import fletcher_checksum, fletcher_checksum_backends, fletcher_checksum_reference
+
+# block sizes covered by the benchmark: from the smallest frames up to the largest AID-ALP frame
+# (class, ID, 2 length bytes and a payload of 700 bytes)
+block_sizes = [8, 16, 32, 64, 128, 256, 512, 704]
+
+
+def verify(num_blocks, seed):
+    # property check: all backends (and the automatic selection) must match the reference implementation
+    # for arbitrary data, including the corner cases of empty blocks and blocks of maximum byte values
+    rng = random.Random(seed)
+    blocks = [b'', b'\x00', b'\xff' * 704, b'\xff' * 0x10003]
+    for _ in range(num_blocks):
+        blocks.append(bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 1024))))
+
+    candidates = dict(fletcher_checksum_backends)
+    candidates['auto'] = fletcher_checksum
+    for block in blocks:
+        expected = fletcher_checksum_reference(block)
+        for name, func in candidates.items():
+            for data in (block, bytearray(block), memoryview(block)):
+                result = func(data)
+                assert result == expected, f"Backend '{name}' calculated {result} instead of {expected} " \
+                                           f"for a block of {len(block)} bytes ({type(data).__name__})."
+    print(f"Verified {len(candidates)} backends against the reference implementation "
+          f"using {len(blocks)} blocks.")
+
+
+def benchmark(min_time):
+    candidates = dict(fletcher_checksum_backends)
+    candidates['auto'] = fletcher_checksum
+    print(f"{'Size [bytes]':>12} " + " ".join(f"{name + ' [MB/s]':>16}" for name in candidates))
+    for size in block_sizes:
+        block = bytes(random.getrandbits(8) for _ in range(size))
+        results = []
+        for func in candidates.values():
+            timer = timeit.Timer(lambda: func(block))
+            number, elapsed = timer.autorange()
+            while elapsed < min_time:
+                number *= 2
+                elapsed = timer.timeit(number)
+            results.append(size * number / elapsed / 1e6)
+        print(f"{size:>12} " + " ".join(f"{r:>16.2f}" for r in results))
+
+
+def run():
+    parser = argparse.ArgumentParser(description='%(prog)s '
+                                                 'Verify and benchmark the Fletcher checksum backends.')
+
+    parser.add_argument('-n', '--num-blocks',
+                        type=int,
+                        help='Number of random blocks used for verification (default: 2000)',
+                        default=2000)
+
+    parser.add_argument('-s', '--seed',
+                        type=int,
+                        help='Seed for the random blocks used for verification (default: 0)',
+                        default=0)
+
+    parser.add_argument('-m', '--min-time',
+                        type=float,
+                        help='Minimum measurement time per backend and block size in seconds (default: 0.2)',
+                        default=0.2)
+
+    args = parser.parse_args()
+
+    verify(args.num_blocks, args.seed)
+    benchmark(args.min_time)
+
+
+if __name__ == '__main__':
+    run()
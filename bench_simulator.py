@@ -0,0 +1,381 @@
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import select
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+import tty
+
+from ubx_gps_simulator import (GPS_WEEK_NS, NAV_POSLLH_SCHEMA, GpsTimeBase, PtyTransport, UbxFrame,
+                               UbxFrameExtractor, UbxGpsSimulator, log, run_multiple, setup_logging)
+
+# baudrate of the simulated receivers: high enough for the line budget not to be a limit of any benchmark
+BAUDRATE = 115200
+
+# cyclic messages enabled by the benchmarks (class and ID): NAV-POSLLH, NAV-SOL, NAV-VELNED and NAV-DOP, optionally
+# with the NMEA sentences RMC, GGA and GSA
+nav_messages = [(0x01, 0x02), (0x01, 0x06), (0x01, 0x12), (0x01, 0x04)]
+nmea_messages = [(0xF0, 0x04), (0xF0, 0x00), (0xF0, 0x02)]
+
+benchmarks = ['ack-latency', 'nav-jitter', 'rx-rate', 'cpu']
+
+
+def serve(conn, count, concurrent):
+    # child process: simulated receivers on pseudo-terminals, run like 'ubx_gps_simulator.py -q -n <count> [-c]'
+    setup_logging([], quiet=True)
+    log.setLevel(logging.WARNING)
+    transports = [PtyTransport(BAUDRATE, 0.01) for _ in range(count)]
+    simulators = [UbxGpsSimulator(serial_port_name=transport.name,
+                                  serial_baudrate=BAUDRATE,
+                                  serial_baudrates_accepted=[BAUDRATE],
+                                  serial_blocking_read_timeout=0.01,
+                                  io_target=1,
+                                  transport=transport)
+                  for transport in transports]
+    time_base = GpsTimeBase()
+    for simulator in simulators:
+        simulator.time_base = time_base
+    conn.send([transport.name for transport in transports])
+    threading.Thread(target=report_cpu_time, args=(conn,), daemon=True).start()
+    if count > 1:
+        run_multiple(simulators)
+    elif concurrent:
+        simulators[0].run_concurrent()
+    else:
+        simulators[0].run()
+
+
+def report_cpu_time(conn):
+    # answer every request of the benchmark with the CPU time (in seconds) used by the simulator process so far
+    while conn.recv():
+        conn.send(time.process_time())
+
+
+class Client:
+    # driver side of a simulated receiver, i.e. the slave side of its pseudo-terminal (opened like a serial port)
+    def __init__(self, name):
+        self.fd = os.open(name, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        tty.setraw(self.fd)
+        self.framer = UbxFrameExtractor()
+        self.received_bytes = 0
+
+    def send(self, data):
+        # write everything (waiting while the pseudo-terminal's buffer is full)
+        view = memoryview(data)
+        while view:
+            select.select([], [self.fd], [])
+            try:
+                view = view[os.write(self.fd, view):]
+            except BlockingIOError:
+                pass
+
+    def receive(self, timeout):
+        # UBX frames received within the timeout (returns as soon as anything has been received), each with the
+        # (monotonic) time of reception in nanoseconds
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        now = time.monotonic_ns()
+        try:
+            data = os.read(self.fd, 0x10000)
+        except BlockingIOError:
+            return []
+        self.received_bytes += len(data)
+        self.framer.feed(data)
+        return [(now, msg) for msg in self.framer.extract()]
+
+    def wait_for(self, msg_class, msg_id, payload=None, timeout=1.0):
+        # time of reception and frame of the first message of the given type (and payload), None after the timeout
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            for received, msg in self.receive(end - time.monotonic()):
+                if (msg.msg_class, msg.msg_id) == (msg_class, msg_id) and payload in (None, bytes(msg.payload)):
+                    return received, msg
+        return None
+
+    def command(self, msg_class, msg_id, payload):
+        # send a CFG message and wait for its ACK-ACK
+        self.send(UbxFrame(msg_class, msg_id, payload).to_bytes())
+        assert self.wait_for(0x05, 0x01, bytes((msg_class, msg_id))), \
+            f"No ACK-ACK for class 0x{msg_class:02X}, ID 0x{msg_id:02X}."
+
+    def configure(self, period_millis, messages):
+        # CFG-RATE and a CFG-MSG for every cyclic message (sent at the navigation rate)
+        self.command(0x06, 0x08, struct.pack('<HHH', period_millis, 1, 1))
+        for msg_class, msg_id in messages:
+            self.command(0x06, 0x01, bytes((msg_class, msg_id, 1)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SimulatedReceivers:
+    # simulated receivers served by a separate process (so that the clients do not compete with them for the
+    # interpreter), accessed via pseudo-terminals
+    def __init__(self, count=1, concurrent=False):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=serve, args=(child_conn, count, concurrent), daemon=True)
+        self.process.start()
+        self.clients = [Client(name) for name in self.conn.recv()]
+
+    def cpu_time(self):
+        self.conn.send(True)
+        return self.conn.recv()
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.process.terminate()
+        self.process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def summary(values):
+    # distribution of measured values (e.g. in milliseconds)
+    if len(values) < 2:
+        return {'count': len(values)}
+    percentiles = statistics.quantiles(values, n=100, method='inclusive')
+    return {'count': len(values), 'min': min(values), 'p50': percentiles[49], 'p99': percentiles[98],
+            'max': max(values), 'mean': statistics.fmean(values), 'stdev': statistics.stdev(values)}
+
+
+def bench_ack_latency(samples, concurrent):
+    # round trip of a CFG message answered by ACK-ACK: a CFG-MSG disabling NAV-POSLLH (i.e. without side effects),
+    # sent as soon as the previous one has been acknowledged
+    latencies = []
+    with SimulatedReceivers(1, concurrent) as receivers:
+        client = receivers.clients[0]
+        frame = UbxFrame(0x06, 0x01, bytes((0x01, 0x02, 0))).to_bytes()
+        for _ in range(samples):
+            start = time.monotonic_ns()
+            client.send(frame)
+            reply = client.wait_for(0x05, 0x01, b'\x06\x01')
+            if reply is not None:
+                latencies.append((reply[0] - start) / 1e6)
+    return {'lost': samples - len(latencies), 'latency_ms': summary(latencies)}
+
+
+def bench_nav_jitter(epochs, period_millis, concurrent, messages):
+    # timing of the cyclic messages relative to their schedule (startup_time_millis plus a multiple of the period):
+    # the lateness of an epoch is the time of reception of its NAV-POSLLH (as GPS time) minus its iTOW
+    time_base = GpsTimeBase()  # (anchored to the same wall-clock time as the simulator's)
+    lateness = []
+    intervals = []
+    with SimulatedReceivers(1, concurrent) as receivers:
+        client = receivers.clients[0]
+        client.configure(period_millis, messages)
+        client.wait_for(0x01, 0x02, timeout=2 * period_millis / 1000)  # (skip the first epoch after the rate change)
+        previous = None
+        while len(lateness) < epochs:
+            reply = client.wait_for(0x01, 0x02, timeout=2 * period_millis / 1000)
+            if reply is None:
+                break
+            received, msg = reply
+            gps_millis = (time_base.anchor_ns + received - time_base.anchor_monotonic_ns) % GPS_WEEK_NS / 1e6
+            lateness.append(gps_millis - NAV_POSLLH_SCHEMA.view_class(msg.payload).itow)
+            if previous is not None:
+                intervals.append((received - previous) / 1e6 - period_millis)
+            previous = received
+    return {'period_ms': period_millis, 'lateness_ms': summary(lateness), 'interval_error_ms': summary(intervals)}
+
+
+def flood(client, rate, duration):
+    # send CFG-MSG frames at the given rate (frames per second) for the given time while collecting their ACK-ACKs;
+    # returns the number of frames sent, the time it took and the number of frames acknowledged
+    frame = UbxFrame(0x06, 0x01, bytes((0x01, 0x02, 0))).to_bytes()
+    total = int(rate * duration)
+    queued = 0  # frames handed over for writing so far
+    written = 0  # bytes written so far
+    pending = bytearray()
+    acked = 0
+    start = time.monotonic()
+    while written < total * len(frame):
+        due = min(int(rate * (time.monotonic() - start)), total) - queued
+        if due > 0:
+            pending += frame * due
+            queued += due
+        if pending:
+            try:
+                count = os.write(client.fd, pending)
+                del pending[:count]
+                written += count
+            except BlockingIOError:
+                pass  # (the simulator does not keep up)
+        acked += count_acks(client.receive(0.0005))
+    elapsed = time.monotonic() - start
+    while True:  # (the acknowledgements of the last frames are still on their way)
+        received = client.receive(0.5)
+        if not received:
+            break
+        acked += count_acks(received)
+    return total, elapsed, acked
+
+
+def count_acks(received):
+    return sum(1 for _, msg in received if (msg.msg_class, msg.msg_id) == (0x05, 0x01))
+
+
+def bench_rx_rate(duration, concurrent, max_rate):
+    # maximum rate of received frames which the simulator sustains without losing any: CFG-MSG frames (each
+    # answered by an ACK-ACK) are sent at a rate which is doubled until frames get lost (or are sent slower than
+    # requested, as the simulator does not keep up), then the limit is narrowed down by bisection
+    steps = []
+    passed, failed = 0, None
+    rate = 250
+    with SimulatedReceivers(1, concurrent) as receivers:
+        client = receivers.clients[0]
+        while rate <= max_rate and (failed is None or failed - passed > passed / 8):
+            sent, elapsed, acked = flood(client, rate, duration)
+            achieved = sent / elapsed
+            steps.append({'rate': rate, 'sent': sent, 'acked': acked, 'achieved_rate': achieved})
+            if acked == sent and achieved >= 0.95 * rate:
+                passed = rate
+            else:
+                failed = rate
+            rate = rate * 2 if failed is None else (passed + failed) // 2
+    return {'max_frame_rate': passed, 'steps': steps}
+
+
+def bench_cpu(receiver_counts, duration, period_millis, messages):
+    # CPU time used by the simulator process per simulated receiver (in percent of one core), with the cyclic
+    # messages enabled at the given period, while the clients read everything
+    results = []
+    for count in receiver_counts:
+        with SimulatedReceivers(count) as receivers:
+            for client in receivers.clients:
+                client.configure(period_millis, messages)
+            fds = {client.fd: client for client in receivers.clients}
+            read_all(fds, 1.0)  # (settle)
+            received_bytes = sum(client.received_bytes for client in receivers.clients)
+            cpu_start, start = receivers.cpu_time(), time.monotonic()
+            read_all(fds, duration)
+            cpu_end, end = receivers.cpu_time(), time.monotonic()
+            received_bytes = sum(client.received_bytes for client in receivers.clients) - received_bytes
+        results.append({'receivers': count,
+                        'cpu_percent': 100 * (cpu_end - cpu_start) / (end - start),
+                        'cpu_percent_per_receiver': 100 * (cpu_end - cpu_start) / (end - start) / count,
+                        'bytes_per_second_per_receiver': received_bytes / (end - start) / count})
+    return results
+
+
+def read_all(fds, duration):
+    # read (and discard) everything the simulated receivers transmit for the given time
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        for fd in select.select(list(fds), [], [], max(end - time.monotonic(), 0))[0]:
+            fds[fd].receive(0)
+
+
+def git_commit():
+    # commit the benchmark has been run for (None if not run from a git working copy)
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_counts(value):
+    # comma-separated numbers of receivers, e.g. '1,8,32'
+    return [int(count) for count in value.split(',')]
+
+
+def run():
+    parser = argparse.ArgumentParser(description='%(prog)s '
+                                                 'Benchmark the simulator end-to-end via pseudo-terminals.')
+
+    parser.add_argument('-b', '--benchmark',
+                        choices=benchmarks,
+                        action='append',
+                        help='Benchmark to run; may be given several times (default: all)')
+
+    parser.add_argument('-o', '--output',
+                        help='Write the results (JSON) to the given file instead of stdout')
+
+    parser.add_argument('-n', '--samples',
+                        type=int,
+                        help='Number of CFG messages for measuring the ACK latency (default: 1000)',
+                        default=1000)
+
+    parser.add_argument('-e', '--epochs',
+                        type=int,
+                        help='Number of epochs for measuring the jitter of the cyclic messages (default: 200)',
+                        default=200)
+
+    parser.add_argument('-m', '--meas-rate',
+                        type=int,
+                        help='Measurement period of the cyclic messages in milliseconds (default: 100, i.e. 10 Hz)',
+                        default=100)
+
+    parser.add_argument('-N', '--nmea',
+                        action='store_true',
+                        help='Enable NMEA sentences in addition to the NAV messages')
+
+    parser.add_argument('-d', '--duration',
+                        type=float,
+                        help='Duration of every step of the RX rate and CPU benchmarks in seconds (default: 2)',
+                        default=2.0)
+
+    parser.add_argument('-R', '--max-rate',
+                        type=int,
+                        help='Highest RX frame rate tried in frames per second (default: 256000)',
+                        default=256000)
+
+    parser.add_argument('-r', '--receivers',
+                        type=parse_counts,
+                        help='Comma-separated numbers of simulated receivers for the CPU benchmark '
+                             '(default: 1,8,32)',
+                        default=[1, 8, 32])
+
+    parser.add_argument('-c', '--concurrent',
+                        action='store_true',
+                        help='Run a single simulated receiver in concurrent mode (as with option -c of the '
+                             'simulator)')
+
+    args = parser.parse_args()
+
+    messages = nav_messages + (nmea_messages if args.nmea else [])
+    results = dict()
+    for benchmark in args.benchmark or benchmarks:
+        print(f"Running benchmark '{benchmark}'...", file=sys.stderr)
+        if benchmark == 'ack-latency':
+            results[benchmark] = bench_ack_latency(args.samples, args.concurrent)
+        elif benchmark == 'nav-jitter':
+            results[benchmark] = bench_nav_jitter(args.epochs, args.meas_rate, args.concurrent, messages)
+        elif benchmark == 'rx-rate':
+            results[benchmark] = bench_rx_rate(args.duration, args.concurrent, args.max_rate)
+        elif benchmark == 'cpu':
+            results[benchmark] = bench_cpu(args.receivers, args.duration, args.meas_rate, messages)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {'concurrent': args.concurrent, 'meas_rate': args.meas_rate, 'nmea': args.nmea,
+                     'baudrate': BAUDRATE},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,66 @@
+import argparse
+
+from ubx_gps_simulator import TrafficRecorder, TrafficRecording, msg_code
+
+
+def parse_int(value):
+    # decimal or hexadecimal (e.g. '0x06') number
+    return int(value, 0)
+
+
+def dump(recording, start_time, direction, msg_class, msg_id, raw_file):
+    if not recording.count:
+        print("Empty recording.")
+        return
+    origin = recording.entry(0)[0]
+    start = recording.find(origin + int(start_time * 1e9))
+    for timestamp, rec_direction, rec_class, rec_id, frame in recording.records(start, direction, msg_class, msg_id):
+        code = msg_code(rec_class, rec_id)
+        arrow = '>>>' if rec_direction == TrafficRecorder.RX else '<<<'
+        print(f"{(timestamp - origin) / 1e9:12.6f} {arrow} {code}: {frame}")
+        if raw_file:
+            raw_file.write(frame)
+
+
+def run():
+    parser = argparse.ArgumentParser(description='%(prog)s '
+                                                 'Dump frames recorded by the simulator (option -w).')
+
+    parser.add_argument(dest='recording',
+                        help='Recording (the index is expected next to it, with the suffix \'.idx\')')
+
+    parser.add_argument('-s', '--start',
+                        type=float,
+                        help='Skip the frames recorded before the given time (in seconds since the first frame; '
+                             'default: 0)',
+                        default=0.0)
+
+    parser.add_argument('-d', '--direction',
+                        choices=['rx', 'tx'],
+                        help='Only dump received (rx) or transmitted (tx) frames')
+
+    parser.add_argument('-c', '--msg-class',
+                        type=parse_int,
+                        help='Only dump frames of the given message class (e.g. 0x06)')
+
+    parser.add_argument('-i', '--msg-id',
+                        type=parse_int,
+                        help='Only dump frames of the given message ID (e.g. 0x08)')
+
+    parser.add_argument('-r', '--raw',
+                        help='Additionally write the dumped frames to the given file as raw UBX log '
+                             '(e.g. with \'-d tx\' to replay the transmitted frames)')
+
+    args = parser.parse_args()
+
+    direction = {'rx': TrafficRecorder.RX, 'tx': TrafficRecorder.TX, None: None}[args.direction]
+    recording = TrafficRecording(args.recording)
+    if args.raw:
+        with open(args.raw, 'wb') as raw_file:
+            dump(recording, args.start, direction, args.msg_class, args.msg_id, raw_file)
+    else:
+        dump(recording, args.start, direction, args.msg_class, args.msg_id, None)
+
+
+if __name__ == '__main__':
+    run()
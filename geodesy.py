@@ -0,0 +1,73 @@
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # optional: only required for converting whole arrays at once
+
+# WGS-84 ellipsoid
+WGS84_A = 6378137.0  # semi-major axis (in meters)
+WGS84_F = 1 / 298.257223563  # flattening
+WGS84_E2 = WGS84_F * (2 - WGS84_F)  # first eccentricity squared
+
+
+def backend(*values):
+    # select the math functions for the given values: NumPy for arrays (converting sequences to arrays),
+    # the 'math' module for scalars (so that single epochs are converted fast and without NumPy)
+    if all(isinstance(value, (int, float)) for value in values):
+        return math, values
+    assert numpy is not None, "Converting arrays requires NumPy."
+    return numpy, tuple(numpy.asarray(value, dtype=numpy.float64) for value in values)
+
+
+def lla_to_ecef(lat, lon, height):
+    # convert geodetic coordinates (latitude and longitude in degrees, height above the ellipsoid in meters)
+    # to ECEF coordinates (in meters)
+    m, (lat, lon, height) = backend(lat, lon, height)
+    lat = m.radians(lat)
+    lon = m.radians(lon)
+    sin_lat = m.sin(lat)
+    cos_lat = m.cos(lat)
+    n = WGS84_A / m.sqrt(1 - WGS84_E2 * sin_lat * sin_lat)  # prime vertical radius of curvature
+    x = (n + height) * cos_lat * m.cos(lon)
+    y = (n + height) * cos_lat * m.sin(lon)
+    z = (n * (1 - WGS84_E2) + height) * sin_lat
+    return x, y, z
+
+
+def radii_of_curvature(lat):
+    # meridian and prime vertical radius of curvature (in meters) at the given latitude (in degrees), e.g. to convert
+    # changes of latitude and longitude into north and east distances
+    m, (lat,) = backend(lat)
+    sin_lat = m.sin(m.radians(lat))
+    w2 = 1 - WGS84_E2 * sin_lat * sin_lat
+    n = WGS84_A / m.sqrt(w2)
+    return n * (1 - WGS84_E2) / w2, n
+
+
+def ned_to_ecef(lat, lon, north, east, down):
+    # rotate vectors (e.g. velocities) from the local north/east/down frame at the given geodetic coordinates
+    # (in degrees) into the ECEF frame
+    m, (lat, lon, north, east, down) = backend(lat, lon, north, east, down)
+    lat = m.radians(lat)
+    lon = m.radians(lon)
+    sin_lat, cos_lat = m.sin(lat), m.cos(lat)
+    sin_lon, cos_lon = m.sin(lon), m.cos(lon)
+    x = -sin_lat * cos_lon * north - sin_lon * east - cos_lat * cos_lon * down
+    y = -sin_lat * sin_lon * north + cos_lon * east - cos_lat * sin_lon * down
+    z = cos_lat * north - sin_lat * down
+    return x, y, z
+
+
+def ecef_to_ned(lat, lon, x, y, z):
+    # rotate vectors (e.g. velocities) from the ECEF frame into the local north/east/down frame at the given
+    # geodetic coordinates (in degrees); inverse of ned_to_ecef()
+    m, (lat, lon, x, y, z) = backend(lat, lon, x, y, z)
+    lat = m.radians(lat)
+    lon = m.radians(lon)
+    sin_lat, cos_lat = m.sin(lat), m.cos(lat)
+    sin_lon, cos_lon = m.sin(lon), m.cos(lon)
+    north = -sin_lat * cos_lon * x - sin_lat * sin_lon * y + cos_lat * z
+    east = -sin_lon * x + cos_lon * y
+    down = -cos_lat * cos_lon * x - cos_lat * sin_lon * y - sin_lat * z
+    return north, east, down
@@ -0,0 +1,40 @@
+import math
+import struct
+
+import pytest
+
+import geodesy
+from ubx_gps_simulator import Trajectory, UbxFrame, UbxLog
+
+
+def nav_frame(msg_id, itow, payload_len):
+    return UbxFrame(0x01, msg_id, struct.pack('<I', itow) + bytes(payload_len - 4)).to_bytes()
+
+
+def test_replay_index_skips_corrupted_frames(tmp_path):
+    log = bytearray()
+    for itow in (1000, 1200, 1400):
+        log += nav_frame(0x02, itow, 28)  # NAV-POSLLH
+        log += nav_frame(0x12, itow, 36)  # NAV-VELNED
+    corrupted = len(nav_frame(0x02, 1000, 28)) * 3 + len(nav_frame(0x12, 1000, 36))  # NAV-VELNED of the 2nd epoch
+    log[corrupted + 6 + 8] ^= 0xff  # (payload byte, length and sync of the next frame intact)
+    filename = tmp_path / 'corrupted.ubx'
+    filename.write_bytes(log)
+
+    for _ in range(2):  # indexed, then loaded from the cached index
+        replay_log = UbxLog(str(filename))
+        assert corrupted - len(nav_frame(0x02, 1000, 28)) in replay_log.frame_offsets
+        assert corrupted not in replay_log.frame_offsets
+        assert len(replay_log.frame_offsets) == 5
+        assert list(replay_log.epoch_times) == [0, 200, 400]
+
+
+def test_trajectory_crosses_antimeridian():
+    pytest.importorskip('numpy')
+    trajectory = Trajectory([0, 10], [10, 10], [179.9995, -179.9995], [0, 0])
+    for t, lon in ((0, 179.9995), (2.5, 179.99975), (5, -180), (7.5, -179.99975)):
+        state = trajectory.sample(t)
+        assert state['lon'] == pytest.approx(lon, abs=1e-9)
+        ecef = geodesy.lla_to_ecef(state['lat'], state['lon'], state['height'])
+        assert math.dist(ecef, (state['ecef_x'], state['ecef_y'], state['ecef_z'])) < 1e-6
+    assert trajectory.sample(5)['vel_e'] == pytest.approx(10.96, abs=0.01)  # (not around the globe)
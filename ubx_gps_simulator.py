@@ -1,7 +1,42 @@
 import argparse
+import array
+import atexit
+import bisect
+import collections
+import csv
+import datetime
+import fcntl
+import geodesy
+import importlib
+import importlib.util
+import http.server
+import itertools
+import json
+import logging
+import logging.handlers
+import math
+import mmap
+import os
 import serial
-import pendulum
-from enum import Enum
+import queue
+import select
+import selectors
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import termios
+import threading
+import time
+import tty
+import xml.etree.ElementTree
+import zlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # optional: only used to speed up processing of large blocks of data and for track playback
 
 
 # TODO
@@ -10,10 +45,6 @@ from enum import Enum
 # - class NavigationInputFilter(Enum):
 #   fixMode (default), fixAlt etc.
 # - class NavigationOutputFilter(...)
-# - current configuration (volatile) vs
-#   default configuration (non-volatile) vs
-#   permanent configuration (non-volatile)
-#   (e.g. by using an external configuration file to load and save)
 # - class StartupMode(Enum):
 #   cold start, warm start, hot start (depending on ephemeris data)
 # - remote inventory (binary or ASCII data)
@@ -128,35 +159,1893 @@ messages = {
         b'\x00': {'code': 'GGA'},  # Global positioning system fix data
         b'\x01': {'code': 'GLL'},  # Latitude and longitude, with time of position fix and status
         b'\x02': {'code': 'GSA'},  # GNSS DOP and Active Satellites
-        b'\x03': {'code': 'GSA'},  # GNSS Satellites in View
+        b'\x03': {'code': 'GSV'},  # GNSS Satellites in View
         b'\x04': {'code': 'RMC'},  # Recommended Minimum data
         b'\x05': {'code': 'VTG'},  # Course over ground and Ground speed
     },
 }
 
+# all diagnostics are logged (with lazy formatting) instead of printed: general messages via 'ubx', messages about
+# received and transmitted frames via a logger per message class (e.g. 'ubx.NAV'), so that the verbosity can be
+# configured per message class
+log = logging.getLogger('ubx')
+msg_logs = {msg_class[0]: log.getChild(entry['class_name']) for msg_class, entry in messages.items()}
+ack_log = msg_logs[0x05]
+cfg_log = msg_logs[0x06]
+mon_log = msg_logs[0x0A]
+aid_log = msg_logs[0x0B]
+
+
+def msg_log(msg_class):
+    # logger for the given message class (as integer); unknown classes are logged via the general logger
+    return msg_logs.get(msg_class, log)
+
+
+class UbxMessageType:
+    # entry of the message registry: everything known about a message (by class and ID), i.e. looked up only once
+    # per received or transmitted frame
+    def __init__(self, msg_class, msg_id, code):
+        self.msg_class = msg_class
+        self.msg_id = msg_id
+        self.code = code  # human-readable code, e.g. 'CFG-RATE'
+        self.schema = None  # for encoding the message (see register_schema())
+        self.handler = None  # for processing received messages (see message_handler())
+        self.payload_lens = None  # expected payload lengths of received messages (None: any)
+        self.accepted_lens = None  # lookup table for the expected payload lengths (a flag per possible length)
+
+    def set_payload_lens(self, payload_lens):
+        # payload lengths given as integers and/or ranges
+        self.payload_lens = payload_lens
+        if payload_lens is None:
+            self.accepted_lens = None
+            return
+        self.accepted_lens = bytearray(0x10000)
+        for payload_len in payload_lens:
+            for n in (payload_len if isinstance(payload_len, range) else [payload_len]):
+                self.accepted_lens[n] = 1
+
+    def accepts_payload_len(self, payload_len):
+        return self.accepted_lens is None or self.accepted_lens[payload_len] == 1
+
+    def describe_payload_lens(self):
+        # e.g. '0, 1 or 20' or '0 or 2..65535'
+        texts = []
+        for payload_len in self.payload_lens:
+            if isinstance(payload_len, range):
+                step = f" (in steps of {payload_len.step})" if payload_len.step > 1 else ""
+                texts.append(f"{payload_len.start}..{payload_len[-1]}{step}")
+            else:
+                texts.append(str(payload_len))
+        return ", ".join(texts[:-1]) + " or " + texts[-1] if len(texts) > 1 else texts[0]
+
+
+# registry of all messages by class and ID (as integers): filled from the 'messages' table when being imported and
+# extended by register_schema() and message_handler()
+message_registry = {(msg_class[0], msg_id[0]): UbxMessageType(msg_class[0], msg_id[0],
+                                                               f"{entry['class_name']}-{msg_entry['code']}")
+                    for msg_class, entry in messages.items()
+                    for msg_id, msg_entry in entry.items() if msg_id != 'class_name'}
+
+# IDs of the NMEA sentences (class 0xF0) by their sentence formatter (e.g. b'GGA')
+nmea_sentence_ids = {msg_entry['code'].encode(): msg_id[0]
+                     for msg_id, msg_entry in messages[b'\xF0'].items() if msg_id != 'class_name'}
+
+
+def msg_code(msg_class, msg_id):
+    # human-readable code of a message (class and ID as integers), e.g. 'CFG-RATE'
+    entry = message_registry.get((msg_class, msg_id))
+    if entry is not None:
+        return entry.code
+    class_entry = messages.get(bytes([msg_class]))
+    return class_entry['class_name'] + "???" if class_entry else "???-???"
+
+
+def message_type(msg_class, msg_id, code=None):
+    # registry entry of a message (class and ID as integers), added to the registry if unknown so far
+    entry = message_registry.get((msg_class, msg_id))
+    if entry is None:
+        entry = UbxMessageType(msg_class, msg_id, code or msg_code(msg_class, msg_id))
+        message_registry[(msg_class, msg_id)] = entry
+    return entry
+
+
+def message_handler(msg_class, msg_id, payload_lens=None, code=None):
+    # decorator registering a function 'handler(simulator, msg)' for received messages of the given class and ID
+    # (as integers), replacing any handler registered before; may be used by other modules to extend the simulator
+    # (see option -P); messages with a payload length other than the expected ones (integers and/or ranges) are
+    # rejected; the handler returns True or False to reply with ACK-ACK or ACK-NAK (None: no reply at all)
+    def register(handler):
+        entry = message_type(msg_class, msg_id, code)
+        entry.handler = handler
+        entry.set_payload_lens(payload_lens)
+        return handler
+    return register
+
+
+def load_plugin(name):
+    # import a module (by module or file name) which registers message handlers
+    sys.modules.setdefault('ubx_gps_simulator', sys.modules[__name__])  # (plugins import this module by its name)
+    if not name.endswith('.py'):
+        return importlib.import_module(name)
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(name))[0], name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # hands over log records to a queue as they are, i.e. leaves all formatting to the thread of the queue's listener
+    # (the arguments of log records must not be changed afterwards)
+    def prepare(self, record):
+        return record
+
+
+def parse_verbosity(value):
+    # '[class=]level', e.g. 'info' for all messages or 'NAV=warning' for messages about NAV frames only
+    name, _, level = value.rpartition('=')
+    logger = msg_logs.get(next((msg_class[0] for msg_class, entry in messages.items()
+                                if entry['class_name'] == name.upper()), None)) if name else log
+    if logger is None:
+        raise argparse.ArgumentTypeError(f"unknown message class '{name}'")
+    if not isinstance(logging.getLevelName(level.upper()), int):
+        raise argparse.ArgumentTypeError(f"unknown log level '{level}'")
+    return logger, logging.getLevelName(level.upper())
+
+
+def setup_logging(verbosity, quiet):
+    # log to stdout from a background thread (which logs all pending records when terminating)
+    if quiet:
+        # only general messages (e.g. the names of pseudo-terminals) and warnings, nothing is logged (or formatted)
+        # about frames
+        log.setLevel(logging.INFO)
+        for logger in msg_logs.values():
+            logger.setLevel(logging.CRITICAL + 1)
+    else:
+        log.setLevel(logging.DEBUG)
+        for logger, level in verbosity:
+            logger.setLevel(level)
+    log_queue = queue.SimpleQueue()
+    log.addHandler(DeferredQueueHandler(log_queue))
+    log.propagate = False
+    listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def fletcher_checksum_reference(block):
+    # calculate checksum using 8 bit Fletcher algorithm (reference implementation, one byte at a time)
+    ck_a = 0
+    ck_b = 0
+    for b in block:
+        ck_a += b
+        ck_a = ck_a & 0xFF
+        ck_b += ck_a
+        ck_b = ck_b & 0xFF
+    return ck_a.to_bytes(1, 'little') + ck_b.to_bytes(1, 'little')
+
+
+def fletcher_checksum_python(block):
+    # closed form of the 8 bit Fletcher algorithm, evaluated by the interpreter's builtins instead of a loop:
+    # CK_A is the sum of all bytes and CK_B is the sum of all running sums of CK_A, both modulo 256
+    ck_b = sum(itertools.accumulate(block))
+    return bytes((sum(block) & 0xFF, ck_b & 0xFF))
+
+
+# descending weights for the vectorized checksum calculation, covering the largest possible frame
+# (class, ID, 2 length bytes and a payload of up to 65535 bytes)
+fletcher_weights = numpy.arange(4 + 0xFFFF, 0, -1, dtype=numpy.int64) if numpy is not None else None
+
+
+def fletcher_checksum_numpy(block):
+    # vectorized closed form: CK_B is the sum of all bytes weighted by their distance from the end
+    # (the 1st of n bytes is added n times, the last byte once)
+    data = numpy.frombuffer(block, dtype=numpy.uint8)
+    ck_a = int(data.sum(dtype=numpy.int64))
+    ck_b = int(numpy.dot(data, fletcher_weights[len(fletcher_weights) - len(data):]))
+    return bytes((ck_a & 0xFF, ck_b & 0xFF))
+
+
+# available checksum backends (all of them give identical results)
+fletcher_checksum_backends = {
+    'reference': fletcher_checksum_reference,
+    'python': fletcher_checksum_python,
+}
+if numpy is not None:
+    fletcher_checksum_backends['numpy'] = fletcher_checksum_numpy
+
+# minimum block length from which the NumPy backend outperforms the pure-Python one (see bench_checksum.py)
+FLETCHER_NUMPY_MIN_LEN = 256
+
+
+def fletcher_checksum(block):
+    # calculate checksum using 8 bit Fletcher algorithm, selecting the fastest backend available for the block size
+    if numpy is not None and len(block) >= FLETCHER_NUMPY_MIN_LEN:
+        return fletcher_checksum_numpy(block)
+    return fletcher_checksum_python(block)
+
+
+def nmea_checksum(body):
+    # XOR of all characters of an NMEA sentence between '$' and '*': the sentence is folded in halves as one large
+    # integer, i.e. a handful of integer operations instead of one step of the interpreter per character
+    value = int.from_bytes(body, 'little')
+    width = len(body) * 8
+    while width > 8:
+        width = (width + 15) // 16 * 8  # (width of the lower half, rounded up to whole bytes)
+        value = (value >> width) ^ (value & ((1 << width) - 1))
+    return value
+
+
+def frame_type(frame):
+    # class and ID (as integers) of a UBX frame or of an NMEA sentence (e.g. '$GPGGA,...' is class 0xF0, ID 0x00)
+    if frame[0] == 0x24:  # '$'
+        return 0xF0, nmea_sentence_ids.get(bytes(frame[3:6]), 0xFF)
+    return frame[2], frame[3]
+
+
+class UbxMessageSchema:
+    # declarative description of a UBX message payload which is precompiled into a single 'struct.Struct';
+    # frames are encoded with 'pack_into' into a reusable buffer that already contains sync bytes, class, ID and length
+    def __init__(self, msg_class, msg_id, fields):
+        # 'fields' is a sequence of (name, format) tuples using the 'struct' format characters (little endian);
+        # reserved fields have no name and use pad bytes ('x'), i.e. they are always set to zero
+        self.msg_class = msg_class
+        self.msg_id = msg_id
+        self.field_names = tuple(name for name, fmt in fields if name is not None)
+        self.struct = struct.Struct('<' + ''.join(fmt for name, fmt in fields))
+        self.payload_len = self.struct.size
+        self.header = b'\xb5\x62' + msg_class + msg_id + self.payload_len.to_bytes(2, 'little')
+        self.frame_template = self.header + bytes(self.payload_len + 2)  # payload and checksum to be filled in
+        self.msg_code = msg_code(msg_class[0], msg_id[0])
+        self.field_offsets = {}  # offset and 'struct.Struct' of each named field (for decoding single fields)
+        offset = 0
+        for name, fmt in fields:
+            if name is not None:
+                self.field_offsets[name] = (offset, struct.Struct('<' + fmt))
+            offset += struct.calcsize('<' + fmt)
+        self.view_class = UbxPayloadView.create(self)
+
+    def pack_payload(self, **values):
+        # encode a payload from fields given by name (e.g. for replies to poll requests), the counterpart of decoding
+        # received payloads with 'view_class'
+        return self.struct.pack(*(values[name] for name in self.field_names))
+
+    def new_frame_buffer(self):
+        # create a buffer for a complete frame (header, payload and checksum)
+        return bytearray(self.frame_template)
+
+    def pack_frame(self, frame, *values):
+        # encode payload fields into a frame buffer created by new_frame_buffer() and update its checksum
+        self.pack_frame_into(frame, 0, *values)
+        return frame
+
+    def pack_frame_into(self, buffer, offset, *values):
+        # encode payload fields into a frame (which has been created from the frame template) at the given offset
+        # of a buffer and update its checksum
+        self.struct.pack_into(buffer, offset + len(self.header), *values)
+        end = offset + len(self.frame_template)
+        with memoryview(buffer) as view:
+            checksum = UbxGpsSimulator.calc_fletcher_checksum(view[offset + 2:end - 2])
+        buffer[end - 2:end] = checksum
+
+
+class UbxPayloadField:
+    # descriptor of a payload field in a payload view: decoded when accessed for the first time, then kept in a slot
+    def __init__(self, offset, field_struct, slot):
+        self.offset = offset
+        self.struct = field_struct
+        self.slot = slot  # (member descriptor of the slot caching the decoded value)
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        try:
+            return self.slot.__get__(view, owner)
+        except AttributeError:
+            value, = self.struct.unpack_from(view.payload, self.offset)
+            self.slot.__set__(view, value)
+            return value
+
+
+class UbxPayloadView:
+    # typed view of a received payload with one attribute per named field of the message's schema, e.g.
+    # 'CfgPrt(msg.payload).baudrate'; nothing is decoded before a field is accessed (and the signedness of the fields
+    # follows the schema), payloads longer than the schema (e.g. optional trailing fields) are accepted
+    __slots__ = ('payload',)
+    schema = None
+
+    def __init__(self, payload):
+        assert len(payload) >= self.schema.payload_len, f"Payload too short for {self.schema.msg_code}."
+        self.payload = payload
+
+    @staticmethod
+    def create(schema):
+        # create a view class for a schema, named after its message (e.g. 'CfgNav5' for CFG-NAV5)
+        name = ''.join(part.capitalize() for part in schema.msg_code.split('-'))
+        view_class = type(name, (UbxPayloadView,), {
+            '__slots__': tuple('_' + field_name for field_name in schema.field_names),
+            'schema': schema})
+        for field_name, (offset, field_struct) in schema.field_offsets.items():
+            setattr(view_class, field_name,
+                    UbxPayloadField(offset, field_struct, view_class.__dict__['_' + field_name]))
+        return view_class
+
+    def values(self):
+        # all fields by name (e.g. to encode a modified copy with 'schema.pack_payload()')
+        return {name: getattr(self, name) for name in self.schema.field_names}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={v}' for k, v in self.values().items())})"
+
+
+def nmea_fields(epoch, utc_time):
+    # fields of the NMEA sentences of an epoch, derived once per epoch and shared by all sentences: angles in units
+    # of 1e-5 minutes and the time in centiseconds (as integers), so that fixed-width fields never round up to
+    # e.g. 60 minutes
+    lat = round(abs(epoch['lat']) * 6000000)
+    lon = round(abs(epoch['lon']) * 6000000)
+    lat_deg, lat_min = divmod(lat, 6000000)
+    lon_deg, lon_min = divmod(lon, 6000000)
+    gps_fix = epoch['gps_fix']
+    return {
+        b'hour': utc_time.hour, b'minute': utc_time.minute, b'second': utc_time.second,
+        b'centis': utc_time.microsecond // 10000,
+        b'day': utc_time.day, b'month': utc_time.month, b'year': utc_time.year % 100,
+        b'lat_deg': lat_deg, b'lat_min': lat_min // 100000, b'lat_frac': lat_min % 100000,
+        b'ns': b'S' if epoch['lat'] < 0 else b'N',
+        b'lon_deg': lon_deg, b'lon_min': lon_min // 100000, b'lon_frac': lon_min % 100000,
+        b'ew': b'W' if epoch['lon'] < 0 else b'E',
+        b'height': epoch['height'],  # (no geoid model, i.e. the height above MSL equals the height above ellipsoid)
+        b'speed_knots': epoch['ground_speed'] * 3600 / 1852, b'speed_kmh': epoch['ground_speed'] * 3.6,
+        b'course': epoch['heading'],
+        b'fix_mode': gps_fix if gps_fix in (2, 3) else 1,  # (GSA: 1 = no fix, 2 = 2D, 3 = 3D)
+        b'num_sv': 0, b'dop': 99.99,  # (no satellites simulated, like NAV-SOL and NAV-DOP)
+    }
+
+
+class NmeaSentence:
+    # precompiled template of an NMEA sentence (talker 'GP') which formats all fields of the sentence with fixed
+    # widths in a single operation from the fields of the epoch (see nmea_fields()); without a fix, a separate
+    # template leaves the position and velocity fields empty (as the receiver does)
+    sample_epoch = {'lat': -89.0, 'lon': -179.0, 'height': 1000.0, 'ground_speed': 30.0, 'heading': 180.0,
+                    'gps_fix': 3}  # (for estimating the length of a sentence)
+
+    def __init__(self, msg_id, fix_template, no_fix_template):
+        self.msg_id = msg_id
+        self.msg_code = msg_code(0xF0, msg_id)
+        address = b'GP' + messages[b'\xF0'][bytes([msg_id])]['code'].encode() + b','
+        self.fix_template = address + fix_template
+        self.no_fix_template = address + no_fix_template
+        self.size = len(self.render(nmea_fields(self.sample_epoch, GPS_EPOCH), True))
+
+    def render(self, fields, fix):
+        body = (self.fix_template if fix else self.no_fix_template) % fields
+        return b'$%s*%02X\r\n' % (body, nmea_checksum(body))
+
+
+def register_sentence(msg_id, fix_template, no_fix_template=None):
+    # add an NMEA sentence to the sentences generated by the simulator (in the order of transmission)
+    sentence = NmeaSentence(msg_id, fix_template, fix_template if no_fix_template is None else no_fix_template)
+    nmea_sentences[msg_id] = sentence
+    return sentence
+
+
+nmea_sentences = dict()  # NMEA sentences generated by the simulator (by ID)
+
+
+class EpochBurst:
+    # the cyclic messages of one epoch (base rate tick), encoded back to back into one contiguous buffer,
+    # so that they can be transmitted with a single write
+    def __init__(self, data=None):
+        self.data = bytearray() if data is None else data  # any buffer (e.g. a slice of a memory-mapped log)
+        self.frames = []  # message code, start and end offset of every frame in the buffer
+
+    def add(self, schema, *values):
+        start = len(self.data)
+        self.data += schema.frame_template
+        schema.pack_frame_into(self.data, start, *values)
+        self.frames.append((schema.msg_code, start, len(self.data)))
+
+    def add_sentence(self, sentence, fields, fix):
+        # (NMEA sentences are transmitted within the same burst as the UBX messages of the epoch)
+        start = len(self.data)
+        self.data += sentence.render(fields, fix)
+        self.frames.append((sentence.msg_code, start, len(self.data)))
+
+
+class EpochRenderer:
+    # provides the rendered epochs for the cyclic transmissions; with a track being played back, the upcoming epochs
+    # are known in advance and get rendered ahead in the background (up to a fixed number of epochs)
+    def __init__(self, simulator, depth=8):
+        self.simulator = simulator
+        self.depth = depth  # maximum number of epochs rendered ahead
+        self.cache = dict()  # epochs rendered ahead (by base rate count)
+        self.version = 0  # incremented whenever the configuration of the cyclic messages changes
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.render_ahead, name='renderer', daemon=True)
+        self.thread.start()
+
+    def invalidate(self):
+        # drop all epochs rendered ahead (as they have been rendered for a different configuration)
+        with self.condition:
+            self.version += 1
+            self.cache.clear()
+            self.condition.notify_all()
+
+    def get(self, count):
+        # get the epoch for the given base rate count, render it right now if it has not been rendered ahead
+        with self.condition:
+            burst = self.cache.pop(count, None)
+            self.condition.notify_all()
+        if burst is None:
+            burst = self.simulator.render_epoch(count)
+        return burst
+
+    def render_ahead(self):
+        # (the scheduler's lock is never acquired while holding the condition: the TX thread holds the lock while
+        # getting an epoch)
+        scheduler = self.simulator.scheduler
+        while not self.simulator.stop_event.is_set():
+            with scheduler.lock:
+                current = scheduler.count
+            with self.condition:
+                version = self.version
+                # drop epochs which have not been picked up in time
+                for count in [count for count in self.cache if count < current]:
+                    del self.cache[count]
+                count = current
+                while count in self.cache:
+                    count += 1
+                if count >= current + self.depth:
+                    self.condition.wait(timeout=scheduler.period_millis / 1000)
+                    continue
+            burst = self.simulator.render_epoch(count)
+            with scheduler.lock:
+                current = scheduler.count
+            with self.condition:
+                # (epochs rendered while the configuration or the period changed are dropped via the version)
+                if self.version == version and count >= current:
+                    self.cache[count] = burst
+
+
+def register_schema(msg_class, msg_id, fields):
+    # add a message schema to the message registry
+    schema = UbxMessageSchema(msg_class, msg_id, fields)
+    message_type(msg_class[0], msg_id[0]).schema = schema
+    return schema
+
+
+class UbxFrame:
+    # a single UBX message: class and ID as integers and the payload as bytes-like object; received frames refer to the
+    # received data (without copying it) and keep their complete raw frame for checking and recording
+    __slots__ = ('msg_class', 'msg_id', 'payload', 'raw')
+
+    SYNC = b'\xb5\x62'
+
+    def __init__(self, msg_class, msg_id, payload=b'', raw=None):
+        self.msg_class = msg_class
+        self.msg_id = msg_id
+        self.payload = payload
+        self.raw = raw  # complete frame as received or encoded before (None: frame to be transmitted, not encoded)
+
+    @property
+    def code(self):
+        return msg_code(self.msg_class, self.msg_id)
+
+    def has_valid_checksum(self):
+        # compare the received checksum with the one calculated over class, ID, length and payload
+        return self.raw is not None and fletcher_checksum(self.raw[2:-2]) == self.raw[-2:]
+
+    def to_bytes(self):
+        # complete frame for transmission (the frame itself is left untouched, e.g. for being sent once more)
+        if self.raw is not None:
+            return bytes(self.raw)  # (no copy if encoded before)
+        body = bytes((self.msg_class, self.msg_id)) + len(self.payload).to_bytes(2, 'little') + self.payload
+        return self.SYNC + body + fletcher_checksum(body)
+
+    def __repr__(self):
+        return f"UbxFrame({self.code}, payload={bytes(self.payload)!r})"
+
+
+class UbxFrameExtractor:
+    # framing engine for received data: collects whatever has been read from the serial port in one buffer and
+    # slices out complete UBX frames in a single pass (instead of walking a state machine for every single byte)
+    HEADER_LEN = 6  # sync (2 bytes), class (1 byte), ID (1 byte), length (2 bytes)
+    CHECKSUM_LEN = 2
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.pos = 0  # position of the first byte in the buffer which has not been consumed yet
+        self.resyncs = 0  # number of times received data had to be discarded to find the next frame
+
+    def feed(self, data):
+        # drop everything that has already been consumed before appending new data
+        if self.pos:
+            del self.buffer[:self.pos]
+            self.pos = 0
+        self.buffer += data
+
+    def extract(self):
+        # extract all complete frames from the buffer (valid or not, checksums are not evaluated here);
+        # the resync behavior is identical to the former byte-wise state machine:
+        # - a 1st sync byte which is not followed by the 2nd sync byte is dropped together with its successor
+        # - a frame with an invalid checksum is skipped completely (no rescan for sync bytes inside of it)
+        bounds = []  # (start, end) of the frames found
+        buf = self.buffer
+        end = len(buf)
+        pos = self.pos
+        while pos < end:
+            start = buf.find(0xB5, pos)
+            if start != pos:
+                self.resyncs += 1  # (data before the sync byte, e.g. NMEA or garbage)
+            if start < 0:
+                pos = end  # no sync byte at all: all data can be dropped
+                break
+            if start + 1 >= end:
+                pos = start  # wait for the 2nd sync byte
+                break
+            if buf[start + 1] != 0x62:
+                self.resyncs += 1
+                pos = start + 2
+                continue
+            if start + self.HEADER_LEN > end:
+                pos = start  # wait for the complete header
+                break
+            frame_end = start + self.HEADER_LEN + (buf[start + 4] | (buf[start + 5] << 8)) + self.CHECKSUM_LEN
+            if frame_end > end:
+                pos = start  # wait for the complete frame
+                break
+            bounds.append((start, frame_end))
+            pos = frame_end
+        self.pos = pos
+        if not bounds:
+            return []
+
+        # a single immutable copy of all frames found, which the frames refer to: the receive buffer itself can be
+        # resized (by the next feed()) while frames are still being processed, e.g. by another thread
+        base = bounds[0][0]
+        data = memoryview(bytes(buf[base:bounds[-1][1]]))
+        frames = []
+        for start, frame_end in bounds:
+            raw = data[start - base:frame_end - base]
+            frames.append(UbxFrame(raw[2], raw[3], raw[self.HEADER_LEN:-self.CHECKSUM_LEN], raw))
+        return frames
+
+
+class CyclicScheduler:
+    # drift-free scheduler for the cyclic transmissions: the n-th base rate tick is due at 'anchor + n * period',
+    # i.e. phase-locked to the anchor (the startup time), no matter when the previous ticks have been handled
+    def __init__(self, anchor_millis, period_millis):
+        self.anchor_millis = anchor_millis
+        self.period_millis = period_millis
+        self.count = 0  # counter for integer multiple intervals of base rate
+        # held while a tick is being handled and while the period changes (from another thread, e.g. by CFG-RATE),
+        # so that a tick is neither lost nor repeated
+        self.lock = threading.Lock()
+
+    def next_tick_millis(self):
+        return self.anchor_millis + self.count * self.period_millis
+
+    def is_due(self, current_time_millis):
+        return current_time_millis >= self.next_tick_millis()
+
+    def advance(self):
+        self.count += 1
+
+    def set_period(self, period_millis, current_time_millis):
+        # change the period without losing phase: re-anchor on the last tick which has been handled and
+        # continue with the first tick of the new period which is not in the past (i.e. no burst of late ticks)
+        with self.lock:
+            if self.count > 0:
+                self.anchor_millis += (self.count - 1) * self.period_millis
+                self.count = max(1, math.ceil((current_time_millis - self.anchor_millis) / period_millis))
+            self.period_millis = period_millis
+
+
+class ReplayScheduler(CyclicScheduler):
+    # scheduler for replaying a recorded log: the n-th epoch (counted from the replay's start position) is due at its
+    # original time relative to the start position, i.e. the log's timing replaces the fixed period
+    def __init__(self, anchor_millis, log):
+        super().__init__(anchor_millis, period_millis=log.period_millis)  # (nominal period, e.g. for lateness)
+        self.log = log
+
+    def next_tick_millis(self):
+        return self.anchor_millis + self.log.epoch_time(self.count)
+
+    def set_period(self, period_millis, current_time_millis):
+        pass  # the timing of the log cannot be reconfigured (e.g. by CFG-RATE)
+
+
+GPS_EPOCH = datetime.datetime(1980, 1, 6, tzinfo=datetime.timezone.utc)  # start of GPS week 0
+GPS_LEAP_SECONDS = 18  # offset between GPS time and UTC (since 2017-01-01)
+GPS_WEEK_NS = 7 * 24 * 3600 * 1000000000
+
+
+class GpsTimeBase:
+    # GPS time of the simulation: anchored once to the wall-clock time (or to a fixed start epoch) and then only
+    # advanced by the monotonic clock, optionally faster than real-time; i.e. cheap to read on every loop iteration
+    # and unaffected by wall-clock adjustments
+    def __init__(self, start_epoch=None, speed=1.0, leap_seconds=GPS_LEAP_SECONDS):
+        # the start epoch is an aware datetime (UTC), by default just now
+        if start_epoch is None:
+            start_epoch = datetime.datetime.now(datetime.timezone.utc)
+        delta = start_epoch - GPS_EPOCH
+        self.leap_seconds = leap_seconds
+        self.speed = speed  # factor of simulated time to real-time
+        self.anchor_ns = ((delta.days * 86400 + delta.seconds + leap_seconds) * 1000000000
+                          + delta.microseconds * 1000)
+        self.anchor_monotonic_ns = time.monotonic_ns()
+
+    virtual = False  # whether the time is advanced explicitly (see VirtualTimeBase)
+
+    @staticmethod
+    def parse_speed(value):
+        # speed factor or 'max' (as fast as possible)
+        return math.inf if value == 'max' else float(value)
+
+    @staticmethod
+    def parse_epoch(value):
+        # ISO 8601 date and time, UTC unless given with an offset (e.g. '2024-05-01T12:00:00Z')
+        timestamp = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+        return timestamp
+
+    def gps_ns(self):
+        # nanoseconds since the start of GPS week 0
+        return self.anchor_ns + int((time.monotonic_ns() - self.anchor_monotonic_ns) * self.speed)
+
+    def millis(self):
+        return self.gps_ns() / 1e6
+
+    def real_seconds(self, millis):
+        # real-time (in seconds) passing while the given span of simulated time (in milliseconds) passes
+        return millis / 1000 / self.speed
+
+    @staticmethod
+    def time_of_week(gps_ns):
+        # split into "GPS Millisecond Time of Week" ('itow'), its fractional part in nanoseconds ('ftow', i.e. the
+        # precise time of week is itow * 1e-3 + ftow * 1e-9) and the GPS week number
+        week, ns = divmod(gps_ns, GPS_WEEK_NS)
+        itow = (ns + 500000) // 1000000
+        ftow = ns - itow * 1000000
+        if itow * 1000000 == GPS_WEEK_NS:  # rounded up to the next week
+            week, itow = week + 1, 0
+        return itow, ftow, week
+
+    def utc(self, gps_ns):
+        # UTC date and time (as datetime with microsecond resolution) and the nanoseconds of the second
+        utc_ns = gps_ns - self.leap_seconds * 1000000000
+        timestamp = GPS_EPOCH + datetime.timedelta(microseconds=utc_ns // 1000)
+        return timestamp, utc_ns % 1000000000
+
+
+class VirtualTimeBase(GpsTimeBase):
+    # simulated GPS time which does not pass by itself, but is advanced explicitly by the run loops from one cyclic
+    # transmission to the next as soon as the simulator is idle: as fast as possible or in lock-step with the
+    # consumer (i.e. once it has read everything transmitted so far, so that nothing gets lost)
+    virtual = True
+    poll_time = 0.0005  # (real) time to wait for received data or for the consumer per loop iteration
+
+    def __init__(self, start_epoch=None, lock_step=False, leap_seconds=GPS_LEAP_SECONDS):
+        super().__init__(start_epoch, speed=1.0, leap_seconds=leap_seconds)  # nominal speed (for the line budget)
+        self.lock_step = lock_step
+        self.virtual_ns = self.anchor_ns
+
+    def gps_ns(self):
+        return self.virtual_ns
+
+    def real_seconds(self, millis):
+        return 0
+
+    def advance_to(self, millis):
+        # the time never goes backwards
+        self.virtual_ns = max(self.virtual_ns, int(millis * 1000000))
+
+
+class TxPacer:
+    # emulates the line rate of a UART for transports which have none: data is released when the line would have
+    # transmitted its last byte (8N1, i.e. 10 bits per byte), consecutive writes queue up behind each other; writing
+    # never blocks, the queued data is released by the simulator's loop (see Transport.release()); like with the
+    # receiver's TX buffer, whole writes get lost when too much data is waiting for the line
+    max_pending = 0x2000  # (bytes)
+
+    def __init__(self, baudrate):
+        self.baudrate = baudrate
+        self.line_idle_time = 0  # (monotonic) time when the emulated line has transmitted all data
+        self.pending = collections.deque()  # data waiting for the line: (release time, data)
+        self.pending_bytes = 0
+
+    def line_time(self, num_bytes):
+        # time (in seconds) to transmit the given number of bytes
+        return num_bytes * 10 / self.baudrate
+
+    def queue(self, data):
+        if self.pending_bytes + len(data) > self.max_pending:
+            return  # (line overloaded)
+        now = time.monotonic()
+        self.line_idle_time = max(now, self.line_idle_time) + self.line_time(len(data))
+        self.pending.append((self.line_idle_time, bytes(data)))
+        self.pending_bytes += len(data)
+
+    def due(self):
+        # all data which the emulated line has transmitted by now (one item per write)
+        now = time.monotonic()
+        while self.pending and self.pending[0][0] <= now:
+            _, data = self.pending.popleft()
+            self.pending_bytes -= len(data)
+            yield data
+
+    def release_time(self):
+        # (monotonic) time when the next data is due, None if nothing is pending (safe to call from any thread)
+        try:
+            return self.pending[0][0]
+        except IndexError:
+            return None
+
+    def clear(self):
+        self.pending.clear()
+        self.pending_bytes = 0
+
+
+class Transport:
+    # common interface of everything the simulator can be accessed through (modelled after 'serial.Serial', which
+    # is what the simulator has been written for); data is transmitted as 8N1 at the (emulated) baudrate
+    def __init__(self, baudrate, timeout, pacing=False):
+        self._baudrate = baudrate
+        self.timeout = timeout  # for blocking reads (in seconds); 0: non-blocking, None: block forever
+        # limit the output rate to the baudrate (for transports without a line rate)
+        self.pacer = TxPacer(baudrate) if pacing else None
+        self.name = None
+        self.description = None
+        self.fd_generation = 0  # changes whenever fileno() returns another file descriptor
+
+    @property
+    def baudrate(self):
+        return self._baudrate
+
+    @baudrate.setter
+    def baudrate(self, baudrate):
+        self._baudrate = baudrate
+        if self.pacer:
+            self.pacer.baudrate = baudrate
+
+    def fileno(self):
+        raise NotImplementedError
+
+    @property
+    def in_waiting(self):
+        raise NotImplementedError
+
+    @property
+    def out_waiting(self):
+        # number of transmitted bytes which the client has not received yet
+        return 0
+
+    def read(self, size=1):
+        raise NotImplementedError
+
+    def write(self, data):
+        # transmit right away or, with pacing, queue the data until the emulated line has transmitted it (i.e. never
+        # block the caller, e.g. a loop serving several receivers)
+        if self.pacer is None:
+            return self.transmit(data)
+        self.pacer.queue(data)
+        self.release()
+        return len(data)
+
+    def transmit(self, data):
+        raise NotImplementedError
+
+    def release(self):
+        # transmit the paced data which is due by now and retry data which could not be transmitted so far; to be
+        # called by the simulator's loop regularly, in particular at release_time()
+        if self.pacer:
+            for data in self.pacer.due():
+                self.transmit(data)
+        self.flush_backlog()
+
+    def release_time(self):
+        # (monotonic) time when paced data is due next, None if nothing is pending
+        return self.pacer.release_time() if self.pacer else None
+
+    @property
+    def paced_bytes(self):
+        # data waiting for the emulated line
+        return self.pacer.pending_bytes if self.pacer else 0
+
+    def flush_backlog(self):
+        pass
+
+    def wait_readable(self, fd):
+        # block for up to 'timeout' seconds until data is available (like 'serial.Serial'), but not beyond the time
+        # when paced data is due
+        timeout = self.timeout
+        release_time = self.release_time()
+        if release_time is not None:
+            delay = max(release_time - time.monotonic(), 0)
+            timeout = delay if timeout is None else min(timeout, delay)
+        if timeout == 0:
+            return True
+        return bool(select.select([fd], [], [], timeout)[0])
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        pass
+
+    def reset_output_buffer(self):
+        if self.pacer:
+            self.pacer.clear()
+
+    def close(self):
+        pass
+
+
+class SerialTransport(Transport):
+    # the receiver's UART, i.e. a real serial port
+    def __init__(self, port_name, baudrate, timeout):
+        self.ser = serial.Serial(port=port_name,
+                                 baudrate=baudrate,
+                                 timeout=timeout)
+        super().__init__(baudrate, timeout)
+        self.name = self.ser.name
+        self.description = f"serial port '{self.name}'"
+
+    @Transport.baudrate.setter
+    def baudrate(self, baudrate):
+        self._baudrate = baudrate
+        self.ser.baudrate = baudrate
+
+    @property
+    def timeout(self):
+        return self.ser.timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self.ser.timeout = timeout
+
+    def fileno(self):
+        return self.ser.fileno()
+
+    @property
+    def in_waiting(self):
+        return self.ser.in_waiting
+
+    @property
+    def out_waiting(self):
+        return self.ser.out_waiting
+
+    def read(self, size=1):
+        return self.ser.read(size)
+
+    def write(self, data):
+        return self.ser.write(data)
+
+    def flush(self):
+        self.ser.flush()
+
+    def reset_input_buffer(self):
+        self.ser.reset_input_buffer()
+
+    def reset_output_buffer(self):
+        self.ser.reset_output_buffer()
+
+    def close(self):
+        self.ser.close()
+
+
+class PtyTransport(Transport):
+    # master side of a pseudo-terminal pair created by the simulator;
+    # clients open the slave side (see 'name') just like a serial port
+    max_backlog = 0x1000  # maximum number of bytes buffered beyond the pseudo-terminal's buffer before data gets lost
+
+    def __init__(self, baudrate, timeout, pacing=False):
+        super().__init__(baudrate, timeout, pacing)
+        self.tx_backlog = bytearray()  # data which has not fit into the pseudo-terminal's buffer yet
+        self.master_fd, self.slave_fd = os.openpty()
+        # keep the slave side open (reads on the master fail as long as no client has it open otherwise)
+        tty.setraw(self.master_fd)
+        tty.setraw(self.slave_fd)
+        os.set_blocking(self.master_fd, False)
+        self.name = os.ttyname(self.slave_fd)
+        self.description = f"pseudo-terminal '{self.name}'"
+
+    def fileno(self):
+        return self.master_fd
+
+    @property
+    def in_waiting(self):
+        return struct.unpack('I', fcntl.ioctl(self.master_fd, termios.FIONREAD, b'\x00' * 4))[0]
+
+    @property
+    def out_waiting(self):
+        # data not written yet and data which the client has not read from the slave side yet
+        if self.tx_backlog:
+            self.flush_backlog()
+        unread = struct.unpack('I', fcntl.ioctl(self.slave_fd, termios.FIONREAD, b'\x00' * 4))[0]
+        return self.paced_bytes + len(self.tx_backlog) + unread
+
+    def read(self, size=1):
+        if not self.wait_readable(self.master_fd):
+            return b''
+        try:
+            return os.read(self.master_fd, size)
+        except BlockingIOError:
+            return b''
+
+    def transmit(self, data):
+        # like a UART, data which nobody reads gets lost (instead of blocking the simulator); a write which only fits
+        # partially is completed later from the backlog and only whole writes get lost, i.e. the client never
+        # receives truncated frames
+        if len(self.tx_backlog) + len(data) <= self.max_backlog:
+            self.tx_backlog += data
+        self.flush_backlog()
+        return len(data)
+
+    def flush_backlog(self):
+        if not self.tx_backlog:
+            return
+        try:
+            written = os.write(self.master_fd, self.tx_backlog)
+            del self.tx_backlog[:written]
+        except BlockingIOError:
+            pass
+
+    def reset_input_buffer(self):
+        termios.tcflush(self.master_fd, termios.TCIFLUSH)
+
+    def reset_output_buffer(self):
+        super().reset_output_buffer()
+        self.tx_backlog.clear()
+        termios.tcflush(self.master_fd, termios.TCOFLUSH)
+
+    def close(self):
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+
+class TcpServerTransport(Transport):
+    # TCP server which clients connect to instead of a serial port (similar to ser2net); serves one client at a time,
+    # i.e. a new connection replaces the previous one
+    max_backlog = 0x10000  # maximum number of bytes buffered for a slow client before data gets lost
+
+    def __init__(self, host, port, baudrate, timeout, pacing=False):
+        super().__init__(baudrate, timeout, pacing)
+        self.server = socket.create_server((host, port))  # (sets SO_REUSEADDR, i.e. allows quick restarts)
+        self.server.setblocking(False)
+        self.client = None
+        self.tx_backlog = bytearray()
+        self.name = f"{host}:{self.server.getsockname()[1]}"
+        self.description = f"TCP server '{self.name}'"
+
+    def fileno(self):
+        # waiting for data also includes waiting for (new) connections
+        return self.client.fileno() if self.client else self.server.fileno()
+
+    def accept(self):
+        try:
+            client, address = self.server.accept()
+        except BlockingIOError:
+            return
+        if self.client:
+            self.client.close()
+        self.client = client
+        self.client.setblocking(False)
+        self.client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.tx_backlog.clear()
+        self.fd_generation += 1
+        log.info("... Client %s:%s connected to %s.", address[0], address[1], self.description)
+
+    def disconnect(self):
+        log.info("... Client disconnected from %s.", self.description)
+        self.client.close()
+        self.client = None
+        self.fd_generation += 1
+
+    @property
+    def in_waiting(self):
+        if not self.client:
+            return 0
+        return struct.unpack('I', fcntl.ioctl(self.client.fileno(), termios.FIONREAD, b'\x00' * 4))[0]
+
+    @property
+    def out_waiting(self):
+        # data not sent yet and data not acknowledged by the client yet
+        if not self.client:
+            return 0
+        if self.tx_backlog:
+            self.flush_backlog()
+        unacknowledged = struct.unpack('I', fcntl.ioctl(self.client.fileno(), termios.TIOCOUTQ, b'\x00' * 4))[0]
+        return self.paced_bytes + len(self.tx_backlog) + unacknowledged
+
+    def read(self, size=1):
+        if not self.wait_readable(self.fileno()):
+            return b''
+        if not self.client:
+            self.accept()
+            return b''
+        try:
+            data = self.client.recv(size)
+        except BlockingIOError:
+            return b''
+        except ConnectionError:
+            data = b''
+        if not data:
+            self.disconnect()
+            self.accept()  # a new client may be waiting already
+        return data
+
+    def transmit(self, data):
+        if not self.client:
+            self.accept()  # allow clients to connect while only transmitting
+        if self.client:
+            if len(self.tx_backlog) + len(data) <= self.max_backlog:
+                self.tx_backlog += data
+            self.flush_backlog()
+        return len(data)
+
+    def flush_backlog(self):
+        if not (self.client and self.tx_backlog):
+            return
+        try:
+            sent = self.client.send(self.tx_backlog)
+            del self.tx_backlog[:sent]
+        except BlockingIOError:
+            pass
+        except ConnectionError:
+            self.disconnect()
+
+    def reset_output_buffer(self):
+        super().reset_output_buffer()
+        self.tx_backlog.clear()
+
+    def close(self):
+        if self.client:
+            self.client.close()
+        self.server.close()
+
+
+class UdpBroadcastTransport(Transport):
+    # transmits all data as UDP broadcast datagrams (one datagram per write) and receives data from datagrams sent
+    # to the listening port (by default the broadcast port + 1, so that the simulator does not receive its own data)
+    def __init__(self, address, port, baudrate, timeout, pacing=False, listen_port=None):
+        super().__init__(baudrate, timeout, pacing)
+        self.destination = (address, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.sock.bind(('', port + 1 if listen_port is None else listen_port))
+        self.sock.setblocking(False)
+        self.rx_buffer = bytearray()  # data of a datagram which has not been read completely
+        self.name = f"{address}:{port}"
+        self.description = f"UDP broadcast '{self.name}' (listening on port {self.sock.getsockname()[1]})"
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    @property
+    def in_waiting(self):
+        return len(self.rx_buffer) + struct.unpack('I', fcntl.ioctl(self.sock.fileno(), termios.FIONREAD,
+                                                                    b'\x00' * 4))[0]
+
+    def read(self, size=1):
+        if not self.rx_buffer:
+            if not self.wait_readable(self.sock.fileno()):
+                return b''
+            try:
+                self.rx_buffer += self.sock.recv(0x10000)
+            except BlockingIOError:
+                return b''
+        data = bytes(self.rx_buffer[:size])
+        del self.rx_buffer[:size]
+        return data
+
+    def transmit(self, data):
+        try:
+            self.sock.sendto(data, self.destination)
+        except (BlockingIOError, OSError):
+            pass  # datagrams may get lost anyway
+        return len(data)
+
+    def reset_input_buffer(self):
+        self.rx_buffer.clear()
+
+    def close(self):
+        self.sock.close()
+
+
+def split_endpoint(endpoint, default_host):
+    # split '[host:]port' into host and port number
+    host, _, port = endpoint.rpartition(':')
+    return host or default_host, int(port)
+
+
+def open_transport(kind, endpoint, baudrate, timeout, pacing=False):
+    # create a transport by its kind ('serial', 'pty', 'tcp' or 'udp'); the endpoint is the serial port name,
+    # '[host:]port' for TCP or '[broadcast address:]port' for UDP (and ignored for pseudo-terminals)
+    if kind == 'serial':
+        return SerialTransport(endpoint, baudrate, timeout)
+    elif kind == 'pty':
+        return PtyTransport(baudrate, timeout, pacing)
+    elif kind == 'tcp':
+        host, port = split_endpoint(endpoint, default_host='localhost')
+        return TcpServerTransport(host, port, baudrate, timeout, pacing)
+    elif kind == 'udp':
+        address, port = split_endpoint(endpoint, default_host='<broadcast>')
+        return UdpBroadcastTransport(address, port, baudrate, timeout, pacing)
+    raise ValueError(f"Unknown transport '{kind}'")
+
+
+class Trajectory:
+    # track for playback: all per-epoch values are precomputed into arrays once when the track is loaded, so that
+    # cyclic transmissions only need an indexed lookup and a linear interpolation
+    position_fields = ('lat', 'lon', 'height', 'ecef_x', 'ecef_y', 'ecef_z')
+    velocity_fields = ('vel_n', 'vel_e', 'vel_d', 'speed', 'ground_speed', 'heading',
+                       'ecef_vx', 'ecef_vy', 'ecef_vz')
+
+    def __init__(self, times, lats, lons, heights, loop=False):
+        # times in seconds (relative to any origin), lat/lon in degrees and heights in meters
+        assert numpy is not None, "Trajectory playback requires NumPy."
+        times = numpy.asarray(times, dtype=numpy.float64)
+        assert len(times) >= 2, "A track needs at least two points."
+        assert numpy.all(numpy.diff(times) > 0), "Track points must be ordered by strictly increasing time."
+        self.times = times - times[0]
+        self.duration = self.times[-1]
+        self.loop = loop
+
+        # positions (one row per track point)
+        lats = numpy.asarray(lats, dtype=numpy.float64)
+        lons = numpy.asarray(lons, dtype=numpy.float64)
+        heights = numpy.asarray(heights, dtype=numpy.float64)
+        ecef = geodesy.lla_to_ecef(lats, lons, heights)
+        self.positions = numpy.column_stack((lats, lons, heights) + ecef)
+
+        # velocities (one row per segment, i.e. constant between two track points, in m/s and degrees);
+        # a last row of zeros is used when standing still at the end of the track; the north/east/down velocities
+        # are derived from the track at the middle of each segment and rotated into the ECEF frame there
+        dt = numpy.diff(self.times)
+        d_lat = numpy.diff(lats)
+        d_lon = (numpy.diff(lons) + 180) % 360 - 180  # (crossing the antimeridian)
+        mid_lats = lats[:-1] + d_lat / 2
+        mid_lons = lons[:-1] + d_lon / 2
+        mid_heights = heights[:-1] + numpy.diff(heights) / 2
+        meridian_radius, prime_vertical_radius = geodesy.radii_of_curvature(mid_lats)
+        # (rounded to um/s to get rid of numerical noise, e.g. a heading of 359.99999 degrees instead of 0 degrees)
+        vel_n = numpy.round(numpy.radians(d_lat) * (meridian_radius + mid_heights) / dt, 6)
+        vel_e = numpy.round(numpy.radians(d_lon) * (prime_vertical_radius + mid_heights)
+                            * numpy.cos(numpy.radians(mid_lats)) / dt, 6)
+        vel_d = numpy.round(-numpy.diff(heights) / dt, 6)
+        ecef_v = list(geodesy.ned_to_ecef(mid_lats, mid_lons, vel_n, vel_e, vel_d))
+        assert numpy.allclose(geodesy.ecef_to_ned(mid_lats, mid_lons, *ecef_v), (vel_n, vel_e, vel_d), atol=1e-6), \
+            "ECEF velocities do not match the north/east/down velocities."
+        ground_speed = numpy.hypot(vel_n, vel_e)
+        speed = numpy.sqrt(ground_speed * ground_speed + vel_d * vel_d)
+        heading = numpy.degrees(numpy.arctan2(vel_e, vel_n)) % 360
+        self.velocities = numpy.zeros((len(self.times), len(self.velocity_fields)))
+        self.velocities[:-1] = numpy.column_stack([vel_n, vel_e, vel_d, speed, ground_speed, heading] + ecef_v)
+
+    @classmethod
+    def load(cls, filename, loop=False):
+        # load a track from a GPX file or a CSV file (columns: time, lat, lon and optionally height; time in seconds or
+        # ISO 8601)
+        if filename.lower().endswith('.gpx'):
+            points = cls.read_gpx(filename)
+        else:
+            points = cls.read_csv(filename)
+        times, lats, lons, heights = zip(*points)
+        return cls(times, lats, lons, heights, loop)
+
+    @staticmethod
+    def parse_time(value):
+        try:
+            return float(value)
+        except ValueError:
+            return datetime.datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+    @classmethod
+    def is_time(cls, value):
+        try:
+            cls.parse_time(value)
+            return True
+        except ValueError:
+            return False
+
+    @classmethod
+    def read_csv(cls, filename):
+        # the height column is optional (default: 0 m); the first row may be a header (i.e. has no time)
+        points = []
+        with open(filename, newline='') as f:
+            reader = csv.reader(f)
+            first_line = None
+            for row in reader:
+                if not row or row[0].startswith('#'):
+                    continue
+                first_line = first_line or reader.line_num
+                try:
+                    if len(row) < 3:
+                        raise ValueError(f"expected at least the columns time, lat and lon, got {len(row)} column(s)")
+                    points.append((cls.parse_time(row[0]), float(row[1]), float(row[2]),
+                                   float(row[3]) if len(row) > 3 else 0.0))
+                except ValueError as e:
+                    if reader.line_num == first_line and not cls.is_time(row[0]):
+                        continue  # skip header line
+                    raise ValueError(f"Malformed track point in '{filename}', line {reader.line_num}: {e}") from None
+        return points
+
+    @classmethod
+    def read_gpx(cls, filename):
+        # read all track points (points without time are assumed to be one second apart)
+        points = []
+        for element in xml.etree.ElementTree.parse(filename).iter():
+            if not element.tag.endswith('trkpt'):
+                continue
+            ele = time_ = None
+            for child in element:
+                if child.tag.endswith('ele'):
+                    ele = float(child.text)
+                elif child.tag.endswith('time'):
+                    time_ = cls.parse_time(child.text.strip())
+            if time_ is None:
+                time_ = points[-1][0] + 1 if points else 0
+            points.append((time_, float(element.get('lat')), float(element.get('lon')), ele or 0.0))
+        return points
+
+    def sample(self, t):
+        # get the state at the given time (in seconds since the start of the playback)
+        if self.loop:
+            t %= self.duration
+        i = int(numpy.searchsorted(self.times, t, side='right')) - 1
+        if i >= len(self.times) - 1:
+            position = self.positions[-1].tolist()  # end of track reached: standing still
+            velocity = self.velocities[-1]
+        elif i < 0:
+            position = self.positions[0].tolist()
+            velocity = self.velocities[-1]
+        else:
+            # interpolate the geodetic coordinates (taking the short way across the antimeridian, like the
+            # velocities) and derive the ECEF coordinates from them, so that both always report the same position
+            frac = float((t - self.times[i]) / (self.times[i + 1] - self.times[i]))
+            (lat0, lon0, height0), (lat1, lon1, height1) = self.positions[i:i + 2, :3].tolist()
+            lat = lat0 + frac * (lat1 - lat0)
+            lon = (lon0 + frac * ((lon1 - lon0 + 180) % 360 - 180) + 180) % 360 - 180
+            height = height0 + frac * (height1 - height0)
+            position = [lat, lon, height, *geodesy.lla_to_ecef(lat, lon, height)]
+            velocity = self.velocities[i]
+        state = dict(zip(self.position_fields, position))
+        state.update(zip(self.velocity_fields, velocity.tolist()))
+        return state
+
+
+class UbxLog:
+    # recorded raw UBX log (e.g. the output of a real receiver) for replay: the file is memory-mapped and indexed once
+    # into compact arrays (offset of every frame, first frame and time of every epoch, by iTOW), so that any position
+    # can be found without parsing the log from the start and frames are transmitted right from the mapping
+    skipped_classes = (0x05, 0x06)  # ACK and CFG messages answered the original host, so they are not replayed
+    # the index is cached in a sidecar file ('.idx'), valid as long as size and modification time of the log match:
+    # a header (magic, log size, mtime in nanoseconds, number of frames and epochs) followed by the arrays (in native
+    # byte order, the cache is not meant to be portable)
+    index_magic = b'UBXLIX\x00\x02'
+    index_header = struct.Struct('<8sQqQQ')
+
+    def __init__(self, filename, loop=False):
+        self.filename = filename
+        self.index_filename = filename + '.idx'
+        self.loop = loop
+        with open(filename, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.data)
+        self.frame_offsets = array.array('Q')  # offset of every frame to be replayed
+        self.epoch_frames = array.array('Q')  # index of the first frame of every epoch (and the end of the last one)
+        self.epoch_times = array.array('q')  # time of every epoch (in milliseconds since the first epoch)
+        if not self.load_index():
+            self.index()
+            assert self.epoch_times, f"No UBX frames found in '{filename}'."
+            self.epoch_frames.append(len(self.frame_offsets))  # end of the last epoch
+            self.save_index()
+        # nominal period: the median interval between epochs (default: 1000 ms)
+        intervals = sorted(b - a for a, b in zip(self.epoch_times, self.epoch_times[1:]))
+        self.period_millis = intervals[len(intervals) // 2] if intervals else 1000
+        self.duration_millis = self.epoch_times[-1] + self.period_millis  # (when looping)
+        self.start = 0  # index of the epoch the replay starts with
+
+    def index(self):
+        # single pass over the whole log: find all frames (skipping anything else, e.g. NMEA messages) and start a new
+        # epoch whenever the iTOW of the NAV messages (whose payload always starts with it) changes; every frame is
+        # verified (corrupted frames are never replayed), which is a one-time cost as the index is cached
+        data = self.data
+        view = self.view
+        size = len(data)
+        unpack_header = struct.Struct('<BBH').unpack_from
+        unpack_itow = struct.Struct('<I').unpack_from
+        frame_offsets = self.frame_offsets
+        week_millis = GPS_WEEK_NS // 1000000
+        last_itow = None
+        time_millis = 0
+        pos = 0
+        while True:
+            if data[pos:pos + 2] != b'\xb5\x62':
+                pos = data.find(b'\xb5\x62', pos)
+                if pos < 0:
+                    break
+            if pos + 8 > size:
+                break
+            msg_class, msg_id, length = unpack_header(data, pos + 2)
+            end = pos + 8 + length
+            if end > size:
+                break  # truncated frame at the end of the log
+            if fletcher_checksum(view[pos + 2:end - 2]) != data[end - 2:end]:
+                pos += 1  # no frame (or a corrupted one), resync
+                continue
+            if msg_class in self.skipped_classes:
+                pos = end
+                continue
+            if not self.epoch_times:
+                self.epoch_frames.append(0)
+                self.epoch_times.append(0)
+            if msg_class == 0x01 and length >= 4:
+                itow, = unpack_itow(data, pos + 6)
+                if last_itow is None:
+                    last_itow = itow  # (belongs to the first epoch)
+                elif itow != last_itow:
+                    interval = itow - last_itow
+                    if interval < -week_millis // 2:
+                        interval += week_millis  # week rollover
+                    if interval > 0:  # (ignore messages of former epochs)
+                        time_millis += interval
+                        self.epoch_frames.append(len(frame_offsets))
+                        self.epoch_times.append(time_millis)
+                        last_itow = itow
+            frame_offsets.append(pos)
+            pos = end
+
+    def load_index(self):
+        # load the cached index (if it is still valid)
+        stat = os.stat(self.filename)
+        try:
+            with open(self.index_filename, 'rb') as f:
+                header = f.read(self.index_header.size)
+                if len(header) < self.index_header.size:
+                    return False
+                magic, log_size, log_mtime_ns, num_frames, num_epochs = self.index_header.unpack(header)
+                if (magic, log_size, log_mtime_ns) != (self.index_magic, stat.st_size, stat.st_mtime_ns):
+                    return False
+                self.frame_offsets.fromfile(f, num_frames)
+                self.epoch_frames.fromfile(f, num_epochs + 1)
+                self.epoch_times.fromfile(f, num_epochs)
+        except (OSError, EOFError):
+            del self.frame_offsets[:], self.epoch_frames[:], self.epoch_times[:]
+            return False
+        return bool(self.epoch_times)
+
+    def save_index(self):
+        # cache the index next to the log (written to a temporary file first, so that concurrent readers never load
+        # an incomplete index); a log in a read-only directory is just indexed again next time
+        stat = os.stat(self.filename)
+        temp_filename = f'{self.index_filename}.{os.getpid()}'
+        try:
+            with open(temp_filename, 'wb') as f:
+                f.write(self.index_header.pack(self.index_magic, stat.st_size, stat.st_mtime_ns,
+                                               len(self.frame_offsets), len(self.epoch_times)))
+                self.frame_offsets.tofile(f)
+                self.epoch_frames.tofile(f)
+                self.epoch_times.tofile(f)
+            os.replace(temp_filename, self.index_filename)
+        except OSError:
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass
+
+    def seek(self, seconds):
+        # start the replay with the first epoch at or after the given time (in seconds since the first epoch)
+        self.start = min(bisect.bisect_left(self.epoch_times, seconds * 1000), len(self.epoch_times) - 1)
+        return self.start
+
+    def epoch_time(self, count):
+        # time of the n-th epoch of the replay (in milliseconds since the start position); beyond the end of the log
+        # (unless looping), the epochs continue with the nominal period, but they are empty
+        first = self.epoch_times[self.start]
+        cycle, index = divmod(self.start + count, len(self.epoch_times))
+        if self.loop:
+            return cycle * self.duration_millis + self.epoch_times[index] - first
+        if cycle:
+            return self.epoch_times[-1] - first + (self.start + count - len(self.epoch_times) + 1) * self.period_millis
+        return self.epoch_times[index] - first
+
+    def render_epoch(self, count):
+        # all frames of the n-th epoch of the replay; frames stored back to back are not copied at all
+        cycle, index = divmod(self.start + count, len(self.epoch_times))
+        if cycle and not self.loop:
+            return EpochBurst()
+        first, last = self.epoch_frames[index], self.epoch_frames[index + 1]
+        ranges = []
+        for offset in self.frame_offsets[first:last]:
+            msg_class, msg_id, length = struct.unpack_from('<BBH', self.data, offset + 2)
+            ranges.append((msg_code(msg_class, msg_id), offset, offset + 8 + length))
+        if not ranges:
+            return EpochBurst()
+        start = ranges[0][1]
+        if all(prev[2] == cur[1] for prev, cur in zip(ranges, ranges[1:])):
+            burst = EpochBurst(self.view[start:ranges[-1][2]])
+            burst.frames = [(code, begin - start, end - start) for code, begin, end in ranges]
+        else:
+            burst = EpochBurst()
+            for code, begin, end in ranges:
+                burst.frames.append((code, len(burst.data), len(burst.data) + end - begin))
+                burst.data += self.view[begin:end]
+        return burst
+
+
+class TrafficRecorder:
+    # append-only binary recording of all received and transmitted frames (instead of capturing the console output):
+    # every record is a fixed header (monotonic timestamp in nanoseconds, direction, class, ID and frame length)
+    # followed by the raw frame; a sidecar index ('.idx') holds a fixed-size entry per record (timestamp, offset,
+    # direction, class and ID), so that recordings can be searched by time (binary search) or by message type
+    # without reading the frames
+    RX = 0
+    TX = 1
+    magic = b'UBXREC\x00\x01'
+    index_magic = b'UBXIDX\x00\x01'
+    record_header = struct.Struct('<qBBBI')
+    index_entry = struct.Struct('<qQBBB')
+    flush_interval_ns = 1000000000  # (so that a crash loses at most about a second of traffic)
+
+    def __init__(self, filename, buffer_size=0x10000):
+        self.filename = filename
+        self.lock = threading.Lock()  # frames are recorded from the RX and TX threads
+        self.file = open(filename, 'wb', buffering=buffer_size)
+        self.index = open(filename + '.idx', 'wb', buffering=buffer_size)
+        self.file.write(self.magic)
+        self.index.write(self.index_magic)
+        self.offset = len(self.magic)
+        self.flush_time_ns = time.monotonic_ns()
+
+    def record(self, direction, frame):
+        timestamp = time.monotonic_ns()
+        msg_class, msg_id = frame_type(frame)
+        with self.lock:
+            if self.file.closed:
+                return  # (frames of other threads while shutting down)
+            self.file.write(self.record_header.pack(timestamp, direction, msg_class, msg_id, len(frame)))
+            self.file.write(frame)
+            self.index.write(self.index_entry.pack(timestamp, self.offset, direction, msg_class, msg_id))
+            self.offset += self.record_header.size + len(frame)
+            if timestamp - self.flush_time_ns > self.flush_interval_ns:
+                self.flush()
+
+    def flush(self):
+        self.file.flush()
+        self.index.flush()
+        self.flush_time_ns = time.monotonic_ns()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+            self.index.close()
+
+
+class TrafficRecording:
+    # reader for recordings of the TrafficRecorder: recording and index are memory-mapped, records are only read
+    # when they are selected via the index
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(filename + '.idx', 'rb') as f:
+            self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        assert self.data[:len(TrafficRecorder.magic)] == TrafficRecorder.magic, f"No recording: '{filename}'."
+        assert self.index[:len(TrafficRecorder.index_magic)] == TrafficRecorder.index_magic, \
+            f"No index of a recording: '{filename}.idx'."
+        # (an incomplete last entry, e.g. after a crash, is ignored)
+        self.count = (len(self.index) - len(TrafficRecorder.index_magic)) // TrafficRecorder.index_entry.size
+
+    def entry(self, n):
+        # timestamp, offset, direction, class and ID of the n-th record
+        return TrafficRecorder.index_entry.unpack_from(self.index, len(TrafficRecorder.index_magic)
+                                                       + n * TrafficRecorder.index_entry.size)
+
+    def find(self, timestamp):
+        # number of the first record at or after the given (monotonic) timestamp
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.entry(middle)[0] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def records(self, start=0, direction=None, msg_class=None, msg_id=None):
+        # timestamp, direction, class, ID and raw frame of all (matching) records from the given record on
+        for n in range(start, self.count):
+            timestamp, offset, rec_direction, rec_class, rec_id = self.entry(n)
+            if direction is not None and rec_direction != direction:
+                continue
+            if msg_class is not None and rec_class != msg_class:
+                continue
+            if msg_id is not None and rec_id != msg_id:
+                continue
+            length = TrafficRecorder.record_header.unpack_from(self.data, offset)[4]
+            begin = offset + TrafficRecorder.record_header.size
+            yield timestamp, rec_direction, rec_class, rec_id, self.data[begin:begin + length]
+
+
+class ConfigStore:
+    # permanent (non-volatile) configuration of a simulated receiver, i.e. what CFG-CFG saves and loads: one file per
+    # section in a directory, each holding the section's encoded configuration; files are replaced atomically and only
+    # written when their content changes, and nothing is read before a section is needed (so that many simulators
+    # start quickly, even with stores on slow disks)
+    sections = {  # section: bit in the clear/save/load masks of CFG-CFG ("configuration sub-sections")
+        'prt': 0,  # ioPort: port configuration (CFG-PRT of the simulated I/O target)
+        'msg': 1,  # msgConf: message rates (CFG-MSG)
+        'inf': 2,  # infMsg: INF message configuration (CFG-INF)
+        'rate': 3,  # navConf: navigation/measurement rate (CFG-RATE)
+        'nav5': 3,  # navConf: navigation engine settings (CFG-NAV5)
+        'sbas': 3,  # navConf: SBAS configuration (CFG-SBAS)
+        'tp': 3,  # navConf: time pulse parameters (CFG-TP)
+        'rinv': 9,  # rinvConf: remote inventory (CFG-RINV)
+    }
+
+    def __init__(self, directory=None):
+        self.directory = directory  # (None: kept in memory only, i.e. lost when the simulator is stopped)
+        self.cache = dict()  # section: content (None: not stored) of the sections read or written so far
+        self.stored = None  # sections stored in the directory (determined when needed first)
+
+    @classmethod
+    def sections_of(cls, mask):
+        # sections selected by a clear/save/load mask of CFG-CFG
+        return [section for section, bit in cls.sections.items() if mask & (1 << bit)]
+
+    def filename(self, section):
+        return os.path.join(self.directory, section + '.cfg')
+
+    def saved_sections(self):
+        # sections which have been saved (with a single directory scan instead of probing each file)
+        if self.stored is None:
+            try:
+                names = os.listdir(self.directory) if self.directory is not None else []
+            except FileNotFoundError:
+                names = []
+            self.stored = {name[:-4] for name in names if name.endswith('.cfg') and name[:-4] in self.sections}
+        return sorted(self.stored)
+
+    def load(self, section):
+        # saved content of a section (None: not saved, i.e. the default configuration applies)
+        if section not in self.cache:
+            content = None
+            if section in self.saved_sections():
+                with open(self.filename(section), 'rb') as file:
+                    content = file.read()
+            self.cache[section] = content
+        return self.cache[section]
+
+    def save(self, section, content):
+        # store a section (unless unchanged) by replacing its file, so that it is never found half-written
+        content = bytes(content)
+        if self.load(section) == content:
+            return False
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_filename = self.filename(section) + '.tmp'
+            with open(temp_filename, 'wb') as file:
+                file.write(content)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_filename, self.filename(section))
+        self.cache[section] = content
+        self.stored.add(section)
+        return True
+
+    def clear(self, section):
+        # revert a section to the default configuration
+        if section in self.saved_sections():
+            if self.directory is not None:
+                os.remove(self.filename(section))
+            self.stored.discard(section)
+        self.cache[section] = None
+
+
+class AlpFile:
+    # AlmanacPlus (ALP) file uploaded to the receiver in chunks (AID-ALP): reassembled into a buffer which is allocated
+    # once (sized from the file header) and validated chunk by chunk, so that the end-of-transfer marker completes the
+    # file without parsing it again; the file is then served via AID-ALPSRV
+    # (the layout of the ALP file header is not covered by the receiver specification: only the file size is taken
+    # from it, assuming a 4-byte magic followed by the file size in bytes; implausible sizes fall back to a default
+    # capacity which grows if needed)
+    header = struct.Struct('<II')  # magic, file size (in bytes)
+    default_capacity = 0x40000
+    max_size = 0x100000
+
+    def __init__(self):
+        self.buffer = None
+        self.size = 0  # bytes received so far
+        self.expected_size = None  # file size according to the header (None: unknown)
+        self.crc = 0  # CRC-32 of the bytes received so far (for comparing uploads with their source files)
+        self.magic = None
+        self.started_ns = time.monotonic_ns()
+        self.finished_ns = None
+
+    def add(self, chunk):
+        # append a chunk (its length is even, i.e. a multiple of the file's 2-byte words); False if it does not fit
+        if self.buffer is None:
+            capacity = self.default_capacity
+            if len(chunk) >= self.header.size:
+                self.magic, size = self.header.unpack_from(chunk)
+                if len(chunk) <= size <= self.max_size:
+                    self.expected_size = capacity = size
+            self.buffer = bytearray(capacity)
+        end = self.size + len(chunk)
+        if self.expected_size is not None and end > self.expected_size or end > self.max_size:
+            return False
+        if end > len(self.buffer):
+            self.buffer.extend(bytes(max(end, 2 * len(self.buffer)) - len(self.buffer)))
+        self.buffer[self.size:end] = chunk
+        self.crc = zlib.crc32(chunk, self.crc)
+        self.size = end
+        return True
+
+    def finish(self):
+        # end of transfer: whether the file is complete
+        self.finished_ns = time.monotonic_ns()
+        return self.size > 0 and self.expected_size in (None, self.size)
+
+    def throughput(self):
+        # upload throughput (in bytes per second) from the first chunk to the end-of-transfer marker
+        return self.size * 1e9 / max(self.finished_ns - self.started_ns, 1)
+
+    def read(self, offset, length):
+        return bytes(self.buffer[offset:min(offset + length, self.size)])
+
+    def write(self, offset, data):
+        # update part of the file (not beyond its end)
+        end = min(offset + len(data), self.size)
+        if offset < end:
+            self.buffer[offset:end] = data[:end - offset]
+
+
+class Histogram:
+    # distribution of observed values in buckets with fixed upper bounds (cumulated when exported, as in the
+    # Prometheus format)
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # (the last bucket has no upper bound)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        # (number of values up to the upper bound of every bucket, by the upper bound)
+        cumulated = list(itertools.accumulate(self.counts))
+        buckets = {str(bound): count for bound, count in zip(self.bounds, cumulated)}
+        buckets['+Inf'] = cumulated[-1]
+        return {'count': cumulated[-1], 'sum': self.sum, 'buckets': buckets}
+
+
+class Metrics:
+    # runtime metrics of a simulated receiver, updated from any thread (cheap enough for every frame) and read via the
+    # MetricsServer or the MetricsDumper; gauges (e.g. the number of queued replies) are read from the simulator
+    # when taking a snapshot (see UbxGpsSimulator.metrics_snapshot())
+    handler_time_buckets = (1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2, 5e-2)  # (seconds)
+    lateness_buckets = (1e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2, 2e-2, 5e-2, 1e-1, 5e-1, 1.0)  # (seconds)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frames = dict()  # number of frames by direction, class and ID
+        self.checksum_failures = 0
+        self.handler_times = dict()  # histograms by message code
+        self.cyclic_tx_lateness = Histogram(self.lateness_buckets)
+
+    def count_frame(self, direction, msg_class, msg_id):
+        key = (direction, msg_class, msg_id)
+        with self.lock:
+            self.frames[key] = self.frames.get(key, 0) + 1
+
+    def count_checksum_failure(self):
+        with self.lock:
+            self.checksum_failures += 1
+
+    def observe_handler_time(self, code, seconds):
+        with self.lock:
+            histogram = self.handler_times.get(code)
+            if histogram is None:
+                histogram = self.handler_times[code] = Histogram(self.handler_time_buckets)
+            histogram.observe(seconds)
+
+    def observe_cyclic_tx_lateness(self, seconds):
+        with self.lock:
+            self.cyclic_tx_lateness.observe(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'frames': [{'direction': 'rx' if direction == TrafficRecorder.RX else 'tx',
+                            'class': msg_class, 'id': msg_id, 'msg': msg_code(msg_class, msg_id), 'count': count}
+                           for (direction, msg_class, msg_id), count in sorted(self.frames.items())],
+                'checksum_failures': self.checksum_failures,
+                'handler_time_seconds': {code: histogram.snapshot()
+                                         for code, histogram in sorted(self.handler_times.items())},
+                'cyclic_tx_lateness_seconds': self.cyclic_tx_lateness.snapshot(),
+            }
+
+
+def format_prometheus(snapshots):
+    # metrics snapshots of all simulated receivers (by name) in the Prometheus text exposition format
+    def labels(**values):
+        return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                              for name, value in values.items()) + '}'
+
+    def histogram(lines, name, label_values, snapshot):
+        for bound, count in snapshot['buckets'].items():
+            lines.append(f"{name}_bucket{labels(**label_values, le=bound)} {count}")
+        lines.append(f"{name}_sum{labels(**label_values)} {snapshot['sum']!r}")
+        lines.append(f"{name}_count{labels(**label_values)} {snapshot['count']}")
+
+    lines = []
+    for name, metric_type, text in [
+            ('ubx_frames_received_total', 'counter', "Frames received with a valid checksum (by message class and ID)"),
+            ('ubx_frames_sent_total', 'counter', "Frames and NMEA sentences sent (by message class and ID)"),
+            ('ubx_checksum_failures_total', 'counter', "Frames received with an invalid checksum"),
+            ('ubx_rx_resyncs_total', 'counter', "Received data discarded to find the next frame"),
+            ('ubx_queued_replies', 'gauge', "Replies waiting for transmission"),
+            ('ubx_handler_time_seconds', 'histogram', "Execution time of the message handlers"),
+            ('ubx_cyclic_tx_lateness_seconds', 'histogram', "Lateness of the cyclic transmissions (simulated time)")]:
+        lines.append(f"# HELP {name} {text}.")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for receiver, snapshot in snapshots.items():
+            if name.startswith('ubx_frames_'):
+                direction = 'rx' if name == 'ubx_frames_received_total' else 'tx'
+                for entry in snapshot['frames']:
+                    if entry['direction'] == direction:
+                        frame_labels = labels(receiver=receiver, msg_class='0x%02X' % entry['class'],
+                                              msg_id='0x%02X' % entry['id'], msg=entry['msg'])
+                        lines.append(f"{name}{frame_labels} {entry['count']}")
+            elif name == 'ubx_checksum_failures_total':
+                lines.append(f"{name}{labels(receiver=receiver)} {snapshot['checksum_failures']}")
+            elif name == 'ubx_rx_resyncs_total':
+                lines.append(f"{name}{labels(receiver=receiver)} {snapshot['rx_resyncs']}")
+            elif name == 'ubx_queued_replies':
+                lines.append(f"{name}{labels(receiver=receiver)} {snapshot['queued_replies']}")
+            elif name == 'ubx_handler_time_seconds':
+                for code, handler_snapshot in snapshot['handler_time_seconds'].items():
+                    histogram(lines, name, {'receiver': receiver, 'msg': code}, handler_snapshot)
+            else:
+                histogram(lines, name, {'receiver': receiver}, snapshot['cyclic_tx_lateness_seconds'])
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    # '/metrics' in the Prometheus text format, '/metrics.json' as JSON
+    def do_GET(self):
+        path = self.path.partition('?')[0]
+        snapshots = {simulator.ser.name: simulator.metrics_snapshot() for simulator in self.server.simulators}
+        if path == '/metrics':
+            body = format_prometheus(snapshots).encode()
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif path == '/metrics.json':
+            body = json.dumps(snapshots).encode()
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        return str(self.client_address[0]) if self.client_address else 'unix socket'
+
+    def log_message(self, format, *args):
+        log.debug("... Metrics request: " + format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class MetricsServer:
+    # serves the metrics of all simulated receivers via HTTP from a background thread: on a TCP port ('[host:]port',
+    # by default on localhost only) or on a Unix socket (a path, e.g. for 'curl --unix-socket <path> http://x/metrics')
+    def __init__(self, simulators, endpoint):
+        if '/' in endpoint:
+            if os.path.exists(endpoint):
+                os.remove(endpoint)  # (left behind by a previous run)
+            self.server = UnixHTTPServer(endpoint, MetricsRequestHandler)
+            self.description = f"Unix socket '{endpoint}'"
+        else:
+            host, port = split_endpoint(endpoint, default_host='localhost')
+            self.server = http.server.ThreadingHTTPServer((host, port), MetricsRequestHandler)
+            self.description = f"http://{host}:{self.server.server_address[1]}/metrics"
+        self.server.simulators = simulators
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        log.info("Serving metrics via %s.", self.description)
+
+
+class MetricsDumper:
+    # appends a snapshot of the metrics of all simulated receivers to a file (one JSON object per line) periodically
+    # and when stopped, i.e. the file shows how the metrics develop during long runs
+    def __init__(self, simulators, filename, interval):
+        self.simulators = simulators
+        self.filename = filename
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='metrics-dump', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        snapshot = {'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    'receivers': {simulator.ser.name: simulator.metrics_snapshot() for simulator in self.simulators}}
+        with open(self.filename, 'a') as f:
+            f.write(json.dumps(snapshot) + '\n')
+
+    def stop(self):
+        self.stop_event.set()
+        self.dump()
+
 
 class UbxGpsSimulator:
-    class RxState(Enum):
-        # states for receiver state machine to parse UBX packet structure
-        WAIT_SYNC_1 = 1  # Wait 1st Sync Byte Rx'ed (0xB5)
-        WAIT_SYNC_2 = 2  # Wait 2nd Sync Byte Rx'ed (0x62)
-        WAIT_MSG_CLASS = 3  # Wait Message Class Byte Rx'ed
-        WAIT_MSG_ID = 4  # Wait Message ID Byte Rx'ed
-        WAIT_LENGTH_1 = 5  # Wait 1st Length Byte Rx'ed
-        WAIT_LENGTH_2 = 6  # Wait 2nd Length Byte Rx'ed
-        WAIT_PAYLOAD_CPLT = 7  # Wait Payload Completely Rx'ed
-        WAIT_CHECKSUM_START = 8  # Wait 1st Checksum Byte Rx'ed
-        WAIT_MSG_CPLT = 9  # Wait 2nd Checksum Byte Rx'ed
+    meas_rate_millis_min = 50  # fastest supported measurement rate: 20 Hz
+
+    # versions reported by MON-VER (u-blox 6, firmware 7.03)
+    sw_version = b'7.03 (45969)'
+    hw_version = b'00040007'
+    rom_version = b'7.03 (45969)'
+
+    # default position (without track playback), standing still and without a fix
+    static_position = (48.139722, 11.574444, 519.0)
+    static_epoch_state = {
+        'lat': static_position[0], 'lon': static_position[1], 'height': static_position[2],
+        **dict(zip(('ecef_x', 'ecef_y', 'ecef_z'), geodesy.lla_to_ecef(*static_position))),
+        'vel_n': 0.0, 'vel_e': 0.0, 'vel_d': 0.0, 'speed': 0.0, 'ground_speed': 0.0, 'heading': 0.0,
+        'ecef_vx': 0.0, 'ecef_vy': 0.0, 'ecef_vz': 0.0,
+        'gps_fix': 0
+    }
 
     def __init__(self,
                  serial_port_name,
                  serial_baudrate,
                  serial_baudrates_accepted,
                  serial_blocking_read_timeout,
-                 io_target):
+                 io_target,
+                 transport=None):
+        # the simulator is accessed via the given transport or, by default, via the serial port
+        self.time_base = None  # GPS time of the simulation (may be shared by several simulators)
         self.startup_time_millis = 0
+        self.scheduler = None
+        self.cyclic_tx_late = False  # whether cyclic transmissions are behind their schedule
+        self.trajectory = None  # track being played back (if any)
+        self.replay = None  # recorded log being replayed instead of the simulated NAV messages (if any)
+        self.recorder = None  # recording of all received and transmitted frames (if any)
+        self.metrics = Metrics()
         self.message_rates = dict()  # start with an empty dict
-        self.queued_replies = []
+        self.line_overloaded = False  # whether the cyclic messages exceed the line's capacity (see check_line_budget())
+        self.meas_rate_millis = 1000  # measurement period; default of 1 Hz
+        self.nav_rate = 1  # number of measurement cycles per navigation solution
+        self.time_ref = 1  # alignment of measurements to 0: UTC time, 1: GPS time
+        self.queued_replies = queue.Queue()  # thread-safe, replies may be queued while transmitting
+        self.pending_replies = []  # replies queued while processing the current received message
+        self.tx_lock = threading.Lock()
+        self.tx_wakeup = threading.Event()  # set when a reply has been queued or the schedule changed
+        self.tx_spin_time = 0.001  # time (in seconds) to busy-wait before a cyclic transmission is due
+        self.rx_queue = queue.Queue()  # received frames (concurrent mode only)
+        self.stop_event = threading.Event()
+        self.rx_framer = UbxFrameExtractor()
+        self.tx_frames = dict()  # reusable frame buffers for encoding messages (by schema)
+        self.epoch_renderer = EpochRenderer(self)
         self.io_target = io_target
         self.baudrates_accepted = serial_baudrates_accepted
 
@@ -164,139 +2053,83 @@ class UbxGpsSimulator:
         # "The serial ports consist of an RX and a TX line.
         #  Neither handshaking signals nor hardware flow control signals are available."
         # Configuration must be 8N1, but different baud rates are possible.
-        self.ser = serial.Serial(port=serial_port_name,
-                                 baudrate=serial_baudrate,
-                                 timeout=serial_blocking_read_timeout)
-        print(f"Opened serial port '{self.ser.name}' with a baudrate of {self.ser.baudrate} and "
-              f"serial blocking read timeout of {serial_blocking_read_timeout} seconds. "
-              f"Simulating I/O target #{self.io_target}.")
+        if transport is None:
+            transport = SerialTransport(serial_port_name, serial_baudrate, serial_blocking_read_timeout)
+        self.ser = transport
+        log.info("Opened %s with a baudrate of %s and blocking read timeout of %s seconds. Simulating I/O target #%s.",
+                 self.ser.description, self.ser.baudrate, serial_blocking_read_timeout, self.io_target)
+
+        # current configuration of the sections which are not reflected by other state (as encoded payloads);
+        # the configuration at startup is the default configuration which CFG-CFG reverts to
+        self.config = {
+            'prt': CFG_PRT_SCHEMA.pack_payload(port_id=self.io_target, tx_ready=0, mode=0x08D0,
+                                               baudrate=self.ser.baudrate, in_proto_mask=0x0007, out_proto_mask=0x0003),
+            'inf': CFG_INF_SCHEMA.pack_payload(protocol_id=0, inf_msg_mask_ddc=0, inf_msg_mask_uart1=0,
+                                               inf_msg_mask_uart2=0, inf_msg_mask_usb=0, inf_msg_mask_spi=0) +
+            CFG_INF_SCHEMA.pack_payload(protocol_id=1, inf_msg_mask_ddc=0x07, inf_msg_mask_uart1=0x07,
+                                        inf_msg_mask_uart2=0x07, inf_msg_mask_usb=0x07, inf_msg_mask_spi=0x07),
+            'nav5': CFG_NAV5_SCHEMA.pack_payload(mask=0xFFFF, dyn_model=0, fix_mode=3, fixed_alt=0, fixed_alt_var=10000,
+                                                 min_elev=5, dr_limit=0, pdop=250, tdop=250, pacc=100, tacc=300,
+                                                 static_hold_thresh=0, dgps_timeout=60),
+            'sbas': CFG_SBAS_SCHEMA.pack_payload(mode=0x01, usage=0x03, max_sbas=3, scan_mode2=0, scan_mode1=0),
+            'tp': CFG_TP_SCHEMA.pack_payload(interval=1000000, length=100000, status=1, time_ref=0, flags=0,
+                                             ant_cable_delay=50, rf_group_delay=0, user_delay=0),
+            'rinv': b'\x00Notice: no data saved!',
+        }
+        self.default_config = {section: self.config_snapshot(section) for section in ConfigStore.sections}
+        self.config_versions = dict.fromkeys(ConfigStore.sections, 0)  # incremented whenever a section changes
+        self.poll_replies = dict()  # encoded replies to poll requests with the version of the section they reflect
+        self.config_store = ConfigStore()  # permanent configuration (kept in memory unless given a directory)
+        self.alp_upload = None  # ALP file being uploaded (AID-ALP)
+        self.alp_file = None  # ALP file uploaded last (served via AID-ALPSRV)
 
     @staticmethod
     def print_protocol_id(identifier):
-        print("        Protocol ID: ", end="")
-        if identifier == 0:
-            print("UBX Protocol")
-        elif identifier == 1:
-            print("NMEA Protocol")
-        else:
-            print("Reserved")
+        cfg_log.debug("        Protocol ID: %s",
+                      "UBX Protocol" if identifier == 0 else "NMEA Protocol" if identifier == 1 else "Reserved")
 
     @staticmethod
     def calc_fletcher_checksum(block):
         # calculate checksum using 8 bit Fletcher algorithm
-        ck_a = 0
-        ck_b = 0
-        for b in block:
-            ck_a += b
-            ck_a = ck_a & 0xFF
-            ck_b += ck_a
-            ck_b = ck_b & 0xFF
-        return ck_a.to_bytes(1, 'little') + ck_b.to_bytes(1, 'little')
+        return fletcher_checksum(block)
 
-    @staticmethod
-    def get_time_of_week(timestamp=None):
+    def get_time_of_week(self, gps_millis=None):
         # calculate "GPS Millisecond Time of Week" ('itow')
-        # from timestamp or for just now
-        if timestamp is None:
-            timestamp = pendulum.now()
-        time_of_week = int(timestamp.format('x')) - int(timestamp.start_of('week').format('x'))
+        # from GPS time (in milliseconds) or for just now
+        if gps_millis is None:
+            gps_millis = self.gps_millis()
+        time_of_week, _, _ = GpsTimeBase.time_of_week(int(gps_millis * 1000000))
         return time_of_week
 
-    @staticmethod
-    def get_msg_code(msg):
-        if msg['class'] in messages:
-            code = messages[msg['class']]['class_name']
-            if msg['id'] in messages[msg['class']]:
-                code += "-" + messages[msg['class']][msg['id']]['code']
-            else:
-                code += "???"
+    def gps_millis(self):
+        # simulated GPS time in milliseconds (since the start of GPS week 0)
+        return self.time_base.millis()
+
+    def start(self):
+        for section in self.config_store.saved_sections():
+            # like the receiver loading its permanent configuration at startup
+            self.config_apply(section, self.config_store.load(section))
+        if self.time_base is None:
+            self.time_base = GpsTimeBase()
+        self.startup_time_millis = self.time_base.gps_ns() // 1000000  # get startup time and store for later usage
+        # the base rate is the navigation rate; actually store a "base period" (default: 1000 ms)
+        if self.replay is not None:
+            self.scheduler = ReplayScheduler(self.startup_time_millis, self.replay)
         else:
-            code = "???-???"
-        return code
-
-    @staticmethod
-    def now():
-        timestamp = pendulum.now()
-        millis = int(timestamp.format('x'))  # cannot just use the attribute 'microseconds' due to wrap-around
-        return timestamp, millis
-
-    def run(self):
-        _, self.startup_time_millis = self.now()  # get startup time and store for later usage
-        base_rate_millis = 1000  # assume a base rate of 1 Hz; actually store a "base period" of 1000 ms
-        base_rate_count = 0  # counter for integer multiple intervals of base rate
+            self.scheduler = CyclicScheduler(self.startup_time_millis, period_millis=self.base_period_millis())
+        if self.trajectory is not None:
+            self.epoch_renderer.start()  # upcoming epochs are known in advance, so render them ahead
+        if self.time_base.virtual and self.ser.timeout:
+            self.ser.timeout = min(self.ser.timeout, self.time_base.poll_time)
         # print(f"... Startup time: now={self.startup_time_millis/1000:.3f} s")  # print for debugging only
 
-        # run the state machine, receiving and processing byte by byte;
-        # please note that this script runs single-threaded and does both RX and TX
-        rx_state = self.RxState.WAIT_SYNC_1
-        msg = {}
+    def run(self):
+        self.start()
 
-        # enter endless loop and process one received byte at a time
+        # receive and process all bytes which are available at once;
+        # please note that this mode runs single-threaded and does both RX and TX (see run_concurrent())
         while True:
-            rx_byte = self.ser.read()
-            # check if timeout has occurred or if a byte has been received
-            # TODO: move this into a less complex part of code (state machine driver)
-            if rx_byte:
-                # a byte has been received
-                if rx_state == self.RxState.WAIT_SYNC_1:
-                    if rx_byte == b'\xb5':
-                        rx_state = self.RxState.WAIT_SYNC_2
-                    else:
-                        rx_state = self.RxState.WAIT_SYNC_1
-                elif rx_state == self.RxState.WAIT_SYNC_2:
-                    if rx_byte == b'\x62':
-                        # print("Found sync bytes (start of message).")
-                        rx_state = self.RxState.WAIT_MSG_CLASS
-                    else:
-                        rx_state = self.RxState.WAIT_SYNC_1
-                elif rx_state == self.RxState.WAIT_MSG_CLASS:
-                    msg = {
-                        'class': rx_byte,
-                        'id': None,
-                        'len_raw': None,
-                        'remaining_len': 0,
-                        'payload': b'',
-                        'checksum': None
-                    }
-                    rx_state = self.RxState.WAIT_MSG_ID
-                elif rx_state == self.RxState.WAIT_MSG_ID:
-                    msg['id'] = rx_byte
-                    rx_state = self.RxState.WAIT_LENGTH_1
-                elif rx_state == self.RxState.WAIT_LENGTH_1:
-                    msg['len_raw'] = rx_byte
-                    rx_state = self.RxState.WAIT_LENGTH_2
-                elif rx_state == self.RxState.WAIT_LENGTH_2:
-                    msg['len_raw'] += rx_byte
-                    # recalculate length from the two bytes
-                    remaining_len = int.from_bytes(msg['len_raw'], 'little', signed=False)
-                    msg['remaining_len'] = remaining_len
-                    if remaining_len > 0:
-                        rx_state = self.RxState.WAIT_PAYLOAD_CPLT
-                    else:
-                        # skipping payload
-                        rx_state = self.RxState.WAIT_CHECKSUM_START
-                elif rx_state == self.RxState.WAIT_PAYLOAD_CPLT:
-                    msg['remaining_len'] -= 1
-                    msg['payload'] += rx_byte
-                    if msg['remaining_len'] <= 0:
-                        rx_state = self.RxState.WAIT_CHECKSUM_START
-                elif rx_state == self.RxState.WAIT_CHECKSUM_START:
-                    # here comes the first byte of the checksum
-                    msg['checksum'] = rx_byte
-                    rx_state = self.RxState.WAIT_MSG_CPLT
-                elif rx_state == self.RxState.WAIT_MSG_CPLT:
-                    msg['checksum'] += rx_byte
-                    if self.has_valid_checksum(msg):
-                        print(f">>> Received VALID message: class 0x{ord(msg['class']):02X}, "
-                              f"ID 0x{ord(msg['id']):02X} ", end="")
-                        if msg['payload'] == b'':
-                            print(f"w/o payload.")
-                        else:
-                            print(f"w/ payload {msg['payload']} (length: {len(msg['payload'])}).")
-                        self.process_message(msg)
-                    else:
-                        print(f"!!! Received INVALID message: {msg}.")
-                    rx_state = self.RxState.WAIT_SYNC_1
+            self.process_rx()
 
             # make sure to transmit *after* having processed the received message as
             # this can have triggered some direct transmissions
@@ -305,242 +2138,444 @@ class UbxGpsSimulator:
             # process queued transmissions
             self.send_queued_replies()
 
-            # handle cyclic transmissions ...
-            current_time, current_time_millis = self.now()
-            # ... using the following mechanics
-            # - so that there may be phase noise but there shall not be frequency drift
-            # - make sure that they are all in sync and use the same timestamp for the cyclic messages
-            if current_time_millis > self.startup_time_millis + base_rate_count * base_rate_millis:
-                # interesting message for debugging purpose:
-                # print(f"... Base rate trigger [{current_time.format('HH:mm:ss')}]. Ready for cyclic messages.")
-
-                if self.check_cyclic_tx(base_rate_count, msg_class=b'\x01', msg_id=b'\x02'):
-                    self.send_nav_posllh(self.get_time_of_week(current_time),
-                                         lon=11.574444, lat=48.139722,
-                                         height=519.0, hmsl=519.0,
-                                         hacc=0, vacc=0)
-                if self.check_cyclic_tx(base_rate_count, msg_class=b'\x01', msg_id=b'\x12'):
-                    self.send_nav_velned(self.get_time_of_week(current_time))
-                if self.check_cyclic_tx(base_rate_count, msg_class=b'\x01', msg_id=b'\x06'):
-                    self.send_nav_sol(self.get_time_of_week(current_time))
-                if self.check_cyclic_tx(base_rate_count, msg_class=b'\x01', msg_id=b'\x04'):
-                    self.send_nav_dop(self.get_time_of_week(current_time))
-                # TODO:
-                # - send_nav_status(ser)
-                # - self.send_nav_timegps(current_time_of_week,
-                #                 frac_time_of_week=0,
-                #                 week=current_time.week_of_year)
-                # - send_nav_timeutc(ser)  # FIXME: not implemented yet
-                # - send_mon_hw(ser)  # FIXME: not implemented yet
-
-                base_rate_count += 1
+            # handle cyclic transmissions
+            if self.time_base.virtual and self.is_idle():
+                self.time_base.advance_to(self.scheduler.next_tick_millis())
+            self.process_cyclic_tx(self.gps_millis())
+
+            # transmit paced data (the blocking read returns in time for it)
+            self.release_tx()
+
+    def is_idle(self):
+        # whether there is nothing left to do at the current (virtual) time: nothing received and no replies waiting,
+        # and (in lock-step) the consumer has read everything transmitted so far
+        if self.ser.in_waiting or self.pending_replies or not self.queued_replies.empty():
+            return False
+        return not (self.time_base.lock_step and self.ser.out_waiting)
+
+    def run_concurrent(self):
+        # run reception, command processing and (queued and cyclic) transmission in separate threads,
+        # so that neither blocking reads nor processing of large configuration bursts delay the cyclic messages
+        self.start()
+        threads = [threading.Thread(target=self.rx_loop, name='rx', daemon=True),
+                   threading.Thread(target=self.processing_loop, name='processing', daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            self.tx_loop()
+        finally:
+            self.stop_event.set()
+            self.rx_queue.put(None)  # wake up processing thread
+            for thread in threads:
+                thread.join()
+
+    def rx_loop(self):
+        # receive and frame data, leave processing to processing_loop()
+        while not self.stop_event.is_set():
+            for msg in self.receive_frames():
+                self.rx_queue.put(msg)
+
+    def processing_loop(self):
+        while not self.stop_event.is_set():
+            msg = self.rx_queue.get()
+            if msg is not None:
+                self.process_frame(msg)
+
+    def tx_loop(self):
+        while not self.stop_event.is_set():
+            self.send_queued_replies()
+            release_time = self.release_tx()
+
+            delay = self.time_base.real_seconds(self.scheduler.next_tick_millis() - self.gps_millis())
+            if delay > self.tx_spin_time:
+                # sleep until shortly before the next tick, but wake up early for queued replies and paced data
+                wait_time = delay - self.tx_spin_time
+                if release_time is not None:
+                    wait_time = min(wait_time, max(release_time - time.monotonic(), 0))
+                if self.tx_wakeup.wait(wait_time):
+                    self.tx_wakeup.clear()
+                continue
+
+            # busy-wait for the remaining fraction of a millisecond to hit the tick precisely
+            while self.gps_millis() < self.scheduler.next_tick_millis():
+                pass
+            self.process_cyclic_tx(self.gps_millis())
+
+    def process_cyclic_tx(self, current_time_millis):
+        # handle cyclic transmissions using the following mechanics
+        # - so that there may be phase noise but there shall not be frequency drift
+        # - make sure that they are all in sync and use the same timestamp for the cyclic messages
+        # - do not let the period change (e.g. by CFG-RATE from the processing thread) while handling a tick
+        scheduler = self.scheduler
+        with scheduler.lock:
+            if not scheduler.is_due(current_time_millis):
+                return
+            # report once when falling behind by more than a whole period (e.g. because the line is overloaded)
+            lateness_millis = current_time_millis - scheduler.next_tick_millis()
+            self.metrics.observe_cyclic_tx_lateness(lateness_millis / 1000)
+            is_late = lateness_millis > scheduler.period_millis
+            if is_late and not self.cyclic_tx_late:
+                log.warning("!!! Cyclic transmission is late by %.0f ms.", lateness_millis)
+            self.cyclic_tx_late = is_late
+            # interesting message for debugging purpose:
+            # print(f"... Base rate trigger [{scheduler.count}]. Ready for cyclic messages.")
+            self.send_epoch(self.epoch_renderer.get(scheduler.count))
+            scheduler.advance()
+
+    def render_epoch(self, base_rate_count):
+        # render the cyclic messages of the given base rate tick (may be called ahead of time and from any thread)
+        if self.replay is not None:
+            return self.replay.render_epoch(base_rate_count)
+        # all cyclic messages of a tick describe the same epoch
+        tick_millis = self.scheduler.anchor_millis + base_rate_count * self.scheduler.period_millis
+        tick_ns = int(tick_millis * 1000000)
+        time_of_week, frac_time_of_week, week = GpsTimeBase.time_of_week(tick_ns)
+        epoch = self.epoch_state((tick_millis - self.startup_time_millis) / 1000)
+        burst = EpochBurst()
+        out_proto_mask = CfgPrt(self.config['prt']).out_proto_mask
+        ubx_out = out_proto_mask & 0x0001
+
+        if ubx_out and self.check_cyclic_tx(base_rate_count, 0x01, 0x02):
+            self.send_nav_posllh(time_of_week,
+                                 lon=epoch['lon'], lat=epoch['lat'],
+                                 height=epoch['height'], hmsl=epoch['height'],  # no geoid model, i.e. hMSL = height
+                                 hacc=0, vacc=0,
+                                 burst=burst)
+        if ubx_out and self.check_cyclic_tx(base_rate_count, 0x01, 0x12):
+            self.send_nav_velned(time_of_week,
+                                 vel_n=epoch['vel_n'] * 100, vel_e=epoch['vel_e'] * 100, vel_d=epoch['vel_d'] * 100,
+                                 speed=epoch['speed'] * 100, ground_speed=epoch['ground_speed'] * 100,
+                                 heading=epoch['heading'],
+                                 burst=burst)
+        if ubx_out and self.check_cyclic_tx(base_rate_count, 0x01, 0x06):
+            self.send_nav_sol(time_of_week,
+                              frac_time_of_week=frac_time_of_week, week=week,
+                              gps_fix=epoch['gps_fix'],
+                              flags=(0x01 if epoch['gps_fix'] else 0x00) | 0x0C,  # gpsFixOK, WKNSET, TOWSET
+                              ecef_x=epoch['ecef_x'] * 100, ecef_y=epoch['ecef_y'] * 100,
+                              ecef_z=epoch['ecef_z'] * 100,
+                              ecef_vx=epoch['ecef_vx'] * 100, ecef_vy=epoch['ecef_vy'] * 100,
+                              ecef_vz=epoch['ecef_vz'] * 100,
+                              burst=burst)
+        if ubx_out and self.check_cyclic_tx(base_rate_count, 0x01, 0x04):
+            self.send_nav_dop(time_of_week,
+                              burst=burst)
+        if ubx_out and self.check_cyclic_tx(base_rate_count, 0x01, 0x01):
+            self.send_nav_posecef(time_of_week,
+                                  ecef_x=epoch['ecef_x'] * 100, ecef_y=epoch['ecef_y'] * 100,
+                                  ecef_z=epoch['ecef_z'] * 100,
+                                  burst=burst)
+        if ubx_out and self.check_cyclic_tx(base_rate_count, 0x01, 0x11):
+            self.send_nav_velecef(time_of_week,
+                                  ecef_vx=epoch['ecef_vx'] * 100, ecef_vy=epoch['ecef_vy'] * 100,
+                                  ecef_vz=epoch['ecef_vz'] * 100,
+                                  burst=burst)
+        if ubx_out and self.check_cyclic_tx(base_rate_count, 0x01, 0x20):
+            self.send_nav_timegps(time_of_week,
+                                  frac_time_of_week=frac_time_of_week, week=week,
+                                  leap_secs=self.time_base.leap_seconds,
+                                  burst=burst)
+        if ubx_out and self.check_cyclic_tx(base_rate_count, 0x01, 0x21):
+            utc_time, utc_nanos = self.time_base.utc(tick_ns)
+            self.send_nav_timeutc(time_of_week,
+                                  utc_time=utc_time, nanos=utc_nanos,
+                                  burst=burst)
+        if out_proto_mask & 0x0002:  # NMEA
+            fields = None
+            for sentence in nmea_sentences.values():
+                if self.check_cyclic_tx(base_rate_count, 0xF0, sentence.msg_id):
+                    if fields is None:  # (once per epoch)
+                        fields = nmea_fields(epoch, self.time_base.utc(tick_ns)[0])
+                    burst.add_sentence(sentence, fields, epoch['gps_fix'] >= 2)
+        # TODO:
+        # - send_nav_status(ser)
+        # - send_mon_hw(ser)  # FIXME: not implemented yet
+
+        return burst
+
+    def send_epoch(self, burst):
+        # transmit all cyclic messages of an epoch with a single write
+        if not burst.frames:
+            return
+        for code, start, end in burst.frames:
+            frame_log = msg_log(0xF0 if burst.data[start] == 0x24 else burst.data[start + 2])  # (NMEA: '$')
+            if frame_log.isEnabledFor(logging.INFO):  # (no copies of frames which are not logged at all)
+                frame_log.info("<<< Sending %s message: %s", code, bytes(burst.data[start:end]))
+        self.write(burst.data)
+        for _, start, end in burst.frames:
+            self.record(TrafficRecorder.TX, burst.data[start:end])
+
+    def epoch_state(self, t):
+        # position and velocity at the given time (in seconds since startup): either from the track being played
+        # back or the static default position
+        if self.trajectory is None:
+            return self.static_epoch_state
+        state = self.trajectory.sample(t)
+        state['gps_fix'] = 3  # 3D fix
+        return state
+
+    def receive_frames(self):
+        # read everything that is available (but at least one byte, i.e. block until the read timeout) and
+        # return all complete frames that can be extracted from it
+        rx_data = self.ser.read(self.ser.in_waiting or 1)
+        # check if timeout has occurred or if any bytes have been received
+        if not rx_data:
+            return []
+        self.rx_framer.feed(rx_data)
+        return self.rx_framer.extract()
+
+    def process_rx(self):
+        for msg in self.receive_frames():
+            self.process_frame(msg)
+
+    def process_frame(self, msg):
+        if msg.has_valid_checksum():
+            self.record(TrafficRecorder.RX, msg.raw)
+            frame_log = msg_log(msg.msg_class)
+            if not msg.payload:
+                frame_log.info(">>> Received VALID message: class 0x%02X, ID 0x%02X w/o payload.",
+                               msg.msg_class, msg.msg_id)
+            elif frame_log.isEnabledFor(logging.INFO):  # (no copies of payloads which are not logged at all)
+                frame_log.info(">>> Received VALID message: class 0x%02X, ID 0x%02X w/ payload %s (length: %d).",
+                               msg.msg_class, msg.msg_id, bytes(msg.payload), len(msg.payload))
+            self.process_message(msg)
+            if self.pending_replies:
+                self.release_replies()
+        else:
+            # (recorded, but only counted as checksum failure)
+            self.metrics.count_checksum_failure()
+            if self.recorder is not None:
+                self.recorder.record(TrafficRecorder.RX, msg.raw)
+            log.warning("!!! Received INVALID message: %s.", msg)
 
     def process_message(self, msg):
         # process message, i.e.
-        # - decode class and ID to a human-readable code
-        # - decode single messages in more detail
-        # - reply with ACK-ACK messages to CFG-* messages
-
-        # handle specific messages
-        if msg['class'] == b'\x06':
-            send_ack = None  # initialize return value (None: do not send ACK or NAK, True: send ACK, False: send NAK)
-
-            # "Configuration Input Messages: Set Dynamic Model, Set DOP Mask,
-            #  Set Baud Rate, etc."
-            # "The CFG Class can be used to configure the receiver and read out
-            #  current configuration values. Any messages in Class CFG sent to the
-            #  receiver are acknowledged (with Message ACK-ACK) if processed
-            #  successfully, and rejected (with Message ACK-NAK) if processing the
-            #  message failed."
-            if msg['id'] == b'\x00':
-                send_ack = self.process_cfg_prt(msg)
-            elif msg['id'] == b'\x01':
-                send_ack = self.process_cfg_msg(msg)
-            elif msg['id'] == b'\x02':
-                send_ack = self.process_cfg_inf(msg)
-            elif msg['id'] == b'\x04':
-                send_ack = self.process_cfg_rst(msg)
-            elif msg['id'] == b'\x07':
-                send_ack = self.process_cfg_tp(msg)
-            elif msg['id'] == b'\x09':
-                send_ack = self.process_cfg_cfg(msg)
-            elif msg['id'] == b'\x16':
-                send_ack = self.process_cfg_sbas(msg)
-            elif msg['id'] == b'\x24':
-                send_ack = self.process_cfg_nav5(msg)
-            elif msg['id'] == b'\x34':
-                send_ack = self.process_cfg_rinv(msg)
+        # - look up the message's handler in the message registry (see message_handler())
+        # - reject messages with unexpected payload lengths
+        # - reply with ACK-ACK or ACK-NAK messages as requested by the handler
+
+        # "The CFG Class can be used to configure the receiver and read out
+        #  current configuration values. Any messages in Class CFG sent to the
+        #  receiver are acknowledged (with Message ACK-ACK) if processed
+        #  successfully, and rejected (with Message ACK-NAK) if processing the
+        #  message failed."
+        msg_class = msg.msg_class
+        entry = message_registry.get((msg_class, msg.msg_id))
+        if entry is None or entry.handler is None:
+            if msg_class == 0x06:
+                log.warning("!!! Received %s - processing not implemented yet (TODO)", msg.code)
             else:
-                print(f"!!! Received {self.get_msg_code(msg)} - processing not implemented yet (TODO)")
-
-            if send_ack in [True, False]:
-                # send ACK-ACK or ACK-NAK
-                self.send_ack_or_nak(msg['class'], msg['id'], send_ack)
-
-        elif msg['class'] == b'\x0a' and msg['id'] == b'\x04':
-            self.process_mon_ver(msg)
-        # elif msg['class'] == b'\x0b' and msg['id'] == b'\x01':
-        #    process_aid_ini(msg)
-        # elif msg['class'] == b'\x0b' and msg['id'] == b'\x32':
-        #    process_aid_alpsrv(msg)
-        elif msg['class'] == b'\x0b' and msg['id'] == b'\x50':
-            self.process_aid_alp(msg)
-            # self.send_ack_ack(msg['class'], msg['id'])  # allow to send next chunk directly
-            # TODO: investigate; at least OBS firmware gives an ACK overrun! may have been wrong in the firmware or here
+                msg_log(msg_class).debug("    %s (unhandled)", msg.code)
+            return
+
+        payload_len = len(msg.payload)
+        if not entry.accepts_payload_len(payload_len):
+            log.warning("!!! Received %s with unexpected payload length %d (expecting %s bytes)",
+                        entry.code, payload_len, entry.describe_payload_lens())
+            send_ack = False if msg_class == 0x06 else None
         else:
-            print(f"    {self.get_msg_code(msg)} (unhandled)")
-            print()  # Improve readability of log by adding an empty line
+            start = time.perf_counter()
+            send_ack = entry.handler(self, msg)  # (None: do not send ACK or NAK, True: send ACK, False: send NAK)
+            self.metrics.observe_handler_time(entry.code, time.perf_counter() - start)
+
+        if send_ack in [True, False]:
+            # send ACK-ACK or ACK-NAK
+            self.send_ack_or_nak(msg.msg_class, msg.msg_id, send_ack)
 
     def queue_reply(self, msg):
-        assert 'class' in msg, "Missing message class"
-        assert 'id' in msg, "Missing message ID"
-        assert 'payload' in msg, "Missing message payload"
-        self.queued_replies.append(msg)
-        print(f"    Queued message. Queue length: {len(self.queued_replies)} replies")
+        assert isinstance(msg, UbxFrame), "Replies must be given as UbxFrame"
+        # hold back the reply until the received message has been processed completely, so that it is not
+        # transmitted before the ACK (which is sent at the end of processing)
+        self.pending_replies.append(msg)
+        log.debug("    Queued message. Queue length: %s replies",
+                  self.queued_replies.qsize() + len(self.pending_replies))
+
+    def queue_poll_reply(self, msg_class, msg_id, section, key, encode):
+        # queue the reply to a poll request; the encoded frame is reused until the configuration section it reflects
+        # (None: none, i.e. constant) changes, as drivers tend to poll the same configuration over and over again
+        version = self.config_versions.get(section, 0)
+        cached = self.poll_replies.get(key)
+        if cached is None or cached[0] != version:
+            reply = UbxFrame(msg_class, msg_id, encode())
+            reply.raw = reply.to_bytes()
+            cached = self.poll_replies[key] = (version, reply)
+        self.queue_reply(cached[1])
+
+    def metrics_snapshot(self):
+        # current values of all metrics of this receiver (see Metrics), including the gauges read right now
+        snapshot = self.metrics.snapshot()
+        snapshot['rx_resyncs'] = self.rx_framer.resyncs
+        snapshot['queued_replies'] = self.queued_replies.qsize() + len(self.pending_replies)
+        return snapshot
+
+    def set_config(self, section, content):
+        # change the current configuration of a section (which is not reflected by other state)
+        self.config[section] = content
+        self.config_versions[section] += 1
+        if section == 'prt':
+            self.epoch_renderer.invalidate()  # (output protocols of the cyclic messages)
+
+    def release_replies(self):
+        # hand over replies queued while processing a received message to transmission
+        for msg in self.pending_replies:
+            self.queued_replies.put(msg)
+        self.pending_replies = []
+        self.tx_wakeup.set()
 
     def send_queued_replies(self):
-        # send replies that have been queued by calling queue_reply()
-        if self.queued_replies:
-            print("... Preparing to send queued replies.")
+        # send replies that have been queued by calling queue_reply() (from any thread)
+        if not self.queued_replies.empty():
+            log.debug("... Preparing to send queued replies.")
             i = 0
-            for msg in self.queued_replies:
-                print(f"... Sending queued reply #{i} ({self.get_msg_code(msg)}): {msg}")
-
-                sync = b'\xb5\x62'
-                length = len(msg['payload']).to_bytes(2, 'little')
-                body = msg['class'] + msg['id'] + length
-                body += msg['payload']
-                cs = self.calc_fletcher_checksum(body)
-                msg['payload'] = sync + body + cs
-                print(f"<<< Sending {self.get_msg_code(msg)} message: {msg['payload']}")
-                print()  # Improve readability of log by adding an empty line
-                self.ser.write(msg['payload'])
+            while True:
+                try:
+                    msg = self.queued_replies.get_nowait()
+                except queue.Empty:
+                    break
+                log.debug("... Sending queued reply #%d (%s): %r", i, msg.code, msg)
+
+                frame = msg.to_bytes()
+                msg_log(msg.msg_class).info("<<< Sending %s message: %s", msg.code, frame)
+                self.write(frame)
+                self.record(TrafficRecorder.TX, frame)
 
                 i += 1
-            self.queued_replies = []  # OK to empty list here as there's no concurrency
 
+    def write(self, data):
+        # transmit data, making sure that concurrent transmissions do not get interleaved
+        with self.tx_lock:
+            self.ser.write(data)
+        if self.ser.release_time() is not None:
+            self.tx_wakeup.set()  # make TX thread (if any) release the paced data in time
+
+    def release_tx(self):
+        # transmit the paced data which is due by now (see Transport.release()); returns the (monotonic) time when
+        # paced data is due next (None: nothing pending)
+        with self.tx_lock:
+            self.ser.release()
+            return self.ser.release_time()
+
+    def record(self, direction, frame):
+        # account for a received or transmitted frame (or NMEA sentence) and add it to the traffic recording (if any)
+        self.metrics.count_frame(direction, *frame_type(frame))
+        if self.recorder is not None:
+            self.recorder.record(direction, frame)
+
+    @message_handler(0x06, 0x00, payload_lens=(0, 1, 20))
     def process_cfg_prt(self, msg):
-        assert msg['class'] == b'\x06' and msg['id'] == b'\x00', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len in [0, 1, 20], f"Unexpected {self.get_msg_code(msg)} " \
-                                          f"payload length (expecting 0, 1 or 20 bytes)."
+        payload_len = len(msg.payload)
         # FIXME: possibly also multiple of 20 bytes (i.e. multiple 'configuration units')
 
         if payload_len == 0:
-            print("      Poll the configuration of the used I/O Port.")
-            # TODO: should queue reply with message configuration (ACK comes first)
-            # self.queue_reply()
+            cfg_log.debug("      Poll the configuration of the used I/O Port.")
+            self.queue_poll_reply(msg.msg_class, msg.msg_id, 'prt', (0x06, 0x00, self.io_target),
+                                  lambda: self.config['prt'])
         elif payload_len == 1:
-            print("      Poll the configuration of one I/O Port.")
-            # TODO: should queue reply with message configuration (ACK comes first)
-            # self.queue_reply()
+            port_id = msg.payload[0]
+            cfg_log.debug("      Poll the configuration of one I/O Port (#%d).", port_id)
+            if port_id > 4:
+                return False  # caller shall send ACK-NAK (no such port)
+            self.queue_poll_reply(msg.msg_class, msg.msg_id, 'prt', (0x06, 0x00, port_id),
+                                  lambda: self.port_config(port_id))
         else:
-            port_id = msg['payload'][0]  # single element is interpreted as integer in the range 0..255 by default
+            prt = CfgPrt(msg.payload)
+            port_id = prt.port_id
             if port_id in [1, 2]:
-                # decoding fields continued for UART ports:
-                # byte #1 is reserved
-                tx_ready = msg['payload'][2:4]
-                mode = msg['payload'][4:8]
-                baudrate = int.from_bytes(msg['payload'][8:12], 'little', signed=False)
-                in_proto_mask = msg['payload'][12:14]
-                out_proto_mask = msg['payload'][14:16]
-                # bytes #16..#20 are reserved
-                print(f"      Port ID:        #{port_id}", end="")
-                if port_id == self.io_target:
-                    print("(*)")  # relevant for us
-                else:
-                    print()
-                print(f"      TX ready:       {tx_ready}")
-                print(f"      Mode:           {mode}")
-                print(f"      Baudrate:       {baudrate} [Bits/s]")
-                print(f"      In proto mask:  {in_proto_mask}")
-                print(f"      Out proto mask: {out_proto_mask}")
+                # decoding fields continued for UART ports
+                if cfg_log.isEnabledFor(logging.DEBUG):
+                    cfg_log.debug("      Port ID:        #%d%s", port_id,
+                                  "(*)" if port_id == self.io_target else "")  # relevant for us
+                    cfg_log.debug("      TX ready:       0x%04X", prt.tx_ready)
+                    cfg_log.debug("      Mode:           0x%08X", prt.mode)
+                    cfg_log.debug("      Baudrate:       %s [Bits/s]", prt.baudrate)
+                    cfg_log.debug("      In proto mask:  0x%04X", prt.in_proto_mask)
+                    cfg_log.debug("      Out proto mask: 0x%04X", prt.out_proto_mask)
                 if port_id == self.io_target:
                     # send ACK-ACK here
-                    if baudrate in self.baudrates_accepted:
-                        self.send_ack_ack(msg['class'], msg['id'])
-                        self.reconfig_baudrate(baudrate)
+                    if prt.baudrate in self.baudrates_accepted:
+                        self.set_config('prt', bytes(msg.payload))
+                        self.send_ack_ack(msg.msg_class, msg.msg_id)
+                        self.reconfig_baudrate(prt.baudrate)
                         return None  # do not allow caller to send ACK-ACK again!
                     else:
                         return False  # caller shall send ACK-NAK due to unsupported baudrate
             else:
                 # FIXME: "also" add support for other configuration units
-                print(f"      Not decoding details for non-UART ports.")
+                cfg_log.debug("      Not decoding details for non-UART ports.")
         return True    # allow caller to send ACK-ACK
 
-    def reconfig_baudrate(self, baudrate):
-        self.ser.flush()
-        print(f"!!! Reconfiguring serial's baudrate to {baudrate}")
-        print()
-        self.ser.baudrate = baudrate
-        self.ser.reset_output_buffer()
-        self.ser.reset_input_buffer()
-
-    def has_valid_checksum(self, msg):
-        # calculate checksum and verify (i.e. compare with received one)
-        # print(f"  Checking message {msg} for valid checksum")
-        calculated_checksum = self.calc_fletcher_checksum(msg['class'] + msg['id'] + msg['len_raw'] + msg['payload'])
-        if calculated_checksum != msg['checksum']:
-            # print("  Checksum mismatch!")
-            # print(f"  Calculated checksum: {calculated_checksum}")
-            # print(f"  Received checksum: {msg['checksum']}")
-            return False
-        else:
-            return True
+    def port_config(self, port_id):
+        # configuration of a port (CFG-PRT payload): the simulated one or, for all others, a fixed configuration
+        if port_id == self.io_target:
+            return self.config['prt']
+        uart = port_id in [1, 2]
+        return CFG_PRT_SCHEMA.pack_payload(port_id=port_id, tx_ready=0, mode=0x08D0 if uart else 0,
+                                           baudrate=9600 if uart else 0, in_proto_mask=0x0007, out_proto_mask=0x0003)
 
-    def send_ack_ack(self, cls_id, msg_id):
+    def reconfig_baudrate(self, baudrate):
+        with self.tx_lock:
+            self.ser.flush()
+            log.warning("!!! Reconfiguring serial's baudrate to %d", baudrate)
+            self.ser.baudrate = baudrate
+            self.ser.reset_output_buffer()
+            self.ser.reset_input_buffer()
+        self.check_line_budget()
+
+    def send_ack_ack(self, msg_class, msg_id):
         # create ACK-ACK packet with message-specific class and ID
         # (as reply to CFG input message)
-        self.send_ack_or_nak(cls_id, msg_id, ack=True)
+        self.send_ack_or_nak(msg_class, msg_id, ack=True)
 
-    def send_ack_nak(self, cls_id, msg_id):
+    def send_ack_nak(self, msg_class, msg_id):
         # create ACK-NAK packet with message-specific class and ID
         # (as reply to CFG input message)
-        self.send_ack_or_nak(cls_id, msg_id, ack=False)
-
-    def send_ack_or_nak(self, cls_id, msg_id, ack):
-        # create ACK-ACK or ACK-NAK packet with message-specific class and ID
+        self.send_ack_or_nak(msg_class, msg_id, ack=False)
+
+    def encode_message(self, schema, *values):
+        # encode a message into the simulator's reusable frame buffer for its schema (no intermediate objects)
+        frame = self.tx_frames.get(schema)
+        if frame is None:
+            frame = self.tx_frames[schema] = schema.new_frame_buffer()
+        return schema.pack_frame(frame, *values)
+
+    def send_message(self, schema, *values, burst=None):
+        # transmit a message right now or add it to the given epoch burst (which is transmitted as a whole)
+        if burst is not None:
+            burst.add(schema, *values)
+            return
+        frame = self.encode_message(schema, *values)
+        frame_log = msg_log(schema.header[2])
+        if frame_log.isEnabledFor(logging.INFO):
+            frame_log.info("<<< Sending %s message: %s", schema.msg_code, bytes(frame))
+        self.write(frame)
+        self.record(TrafficRecorder.TX, frame)
+
+    def send_ack_or_nak(self, msg_class, msg_id, ack):
+        # create ACK-ACK or ACK-NAK packet with message-specific class and ID (as integers)
         # (as reply to CFG input message)
-        sync = b'\xb5\x62'
-        body = b'\x05'
         # use different IDs for ACK-ACK and ACK-NAK
-        if ack:
-            body += b'\x01'
-        else:
-            body += b'\x00'
-        body += b'\x02\x00' + cls_id + msg_id
-        cs = self.calc_fletcher_checksum(body)
-        msg = sync + body + cs
-        print(f"<<< Sending ACK-{'ACK' if ack else 'NAK'} response: {msg}")
-        print()  # Improve readability of log by adding an empty line
-        self.ser.write(msg)
+        frame = self.encode_message(ACK_ACK_SCHEMA if ack else ACK_NAK_SCHEMA, msg_class, msg_id)
+        if ack_log.isEnabledFor(logging.INFO):
+            ack_log.info("<<< Sending ACK-%s response: %s", 'ACK' if ack else 'NAK', bytes(frame))
+        self.write(frame)
+        self.record(TrafficRecorder.TX, frame)
 
     def send_nav_posllh(self,
                         time_of_week=None,
                         lon=0.0, lat=0.0,
                         height=0.0, hmsl=0.0,
-                        hacc=0.0, vacc=0.0):
+                        hacc=0.0, vacc=0.0,
+                        burst=None):
         # create NAV-POSLLH Geodetic Position Solution message
-        # lon and lat are inputs in degrees, but as floats
-        sync = b'\xb5\x62'
-        msg = {'class': b'\x01', 'id': b'\x02'}
-        body = msg['class'] + msg['id'] + b'\x1C\x00'  # length of inner payload is 28 bytes
-        lon = int(lon * 1e7).to_bytes(4, 'little')
-        lat = int(lat * 1e7).to_bytes(4, 'little')
-        height = int(height * 1e3).to_bytes(4, 'little')  # from meters to cm
-        hmsl = int(hmsl).to_bytes(4, 'little')  # from meters to cm
-        hacc = int(hacc).to_bytes(4, 'little')
-        vacc = int(vacc).to_bytes(4, 'little')
+        # lon and lat are inputs in degrees, but as floats; height and hmsl are inputs in meters
         if time_of_week is None:
             time_of_week = self.get_time_of_week()
-        itow = time_of_week.to_bytes(4, 'little')
-        body += itow + lon + lat + height + hmsl + hacc + vacc  # FIXME: not all fields are SIGNED integers!
-        assert len(body) == (4+28), "Unexpected message body length."
-        cs = self.calc_fletcher_checksum(body)
-        msg['payload'] = sync + body + cs
-        print(f"<<< Sending {self.get_msg_code(msg)} message: {msg['payload']}")
-        print()  # Improve readability of log by adding an empty line
-        self.ser.write(msg['payload'])
+        self.send_message(NAV_POSLLH_SCHEMA,
+                          time_of_week,
+                          int(lon * 1e7), int(lat * 1e7),
+                          int(height * 1e3), int(hmsl * 1e3),  # from meters to mm
+                          int(hacc), int(vacc),
+                          burst=burst)
 
     def send_nav_dop(self,
                      time_of_week=None,
@@ -550,27 +2585,15 @@ class UbxGpsSimulator:
                      vdop=0,
                      hdop=0,
                      ndop=0,
-                     edop=0):
-        sync = b'\xb5\x62'
-        msg = {'class': b'\x01', 'id': b'\x04'}
-        body = msg['class'] + msg['id'] + b'\x12\x00'  # length of inner payload is 18 bytes
-        gdop = int(gdop * 100).to_bytes(2, 'little')
-        pdop = int(pdop * 100).to_bytes(2, 'little')
-        tdop = int(tdop * 100).to_bytes(2, 'little')
-        vdop = int(vdop * 100).to_bytes(2, 'little')
-        hdop = int(hdop * 100).to_bytes(2, 'little')
-        ndop = int(ndop * 100).to_bytes(2, 'little')
-        edop = int(edop * 100).to_bytes(2, 'little')
+                     edop=0,
+                     burst=None):
         if time_of_week is None:
             time_of_week = self.get_time_of_week()
-        itow = time_of_week.to_bytes(4, 'little')
-        body += itow + gdop + pdop + tdop + vdop + hdop + ndop + edop
-        assert len(body) == (4+18), "Unexpected message body length."
-        cs = self.calc_fletcher_checksum(body)
-        msg['payload'] = sync + body + cs
-        print(f"<<< Sending {self.get_msg_code(msg)} message: {msg['payload']}")
-        print()  # Improve readability of log by adding an empty line
-        self.ser.write(msg['payload'])
+        self.send_message(NAV_DOP_SCHEMA,
+                          time_of_week,
+                          int(gdop * 100), int(pdop * 100), int(tdop * 100), int(vdop * 100),
+                          int(hdop * 100), int(ndop * 100), int(edop * 100),
+                          burst=burst)
 
     def send_nav_status(self,
                         time_of_week=None,
@@ -579,25 +2602,15 @@ class UbxGpsSimulator:
                         fix_stat=0,
                         nav_status_flags2=0,
                         time_to_first_fix=0,
-                        startup_time=0):
-        sync = b'\xb5\x62'
-        body = b'\x01\x03\x10\x00'  # message body length is 16 bytes
-        gps_fix = int(gps_fix).to_bytes(4, 'little')
-        nav_status_flags = int(nav_status_flags).to_bytes(1, 'little')
-        fix_stat = int(fix_stat).to_bytes(1, 'little')
-        nav_status_flags2 = int(nav_status_flags2).to_bytes(1, 'little')
-        ttff = int(time_to_first_fix).to_bytes(4, 'little')
-        msss = int(startup_time).to_bytes(4, 'little')
+                        startup_time=0,
+                        burst=None):
         if time_of_week is None:
             time_of_week = self.get_time_of_week()
-        itow = time_of_week.to_bytes(4, 'little')
-        body += itow + gps_fix + nav_status_flags + fix_stat + nav_status_flags2 + ttff + msss
-        assert len(body) == 16, "Unexpected message body length."
-        cs = self.calc_fletcher_checksum(body)
-        msg = sync + body + cs
-        print(f"<<< Sending {self.get_msg_code(msg)} message: {msg}")
-        print()  # Improve readability of log by adding an empty line
-        self.ser.write(msg)
+        self.send_message(NAV_STATUS_SCHEMA,
+                          time_of_week,
+                          int(gps_fix), int(nav_status_flags), int(fix_stat), int(nav_status_flags2),
+                          int(time_to_first_fix), int(startup_time),
+                          burst=burst)
 
     def send_nav_velned(self,
                         time_of_week=None,
@@ -608,36 +2621,23 @@ class UbxGpsSimulator:
                         ground_speed=0,  # cm/s
                         heading=0,  # deg
                         speed_acc_est=0,  # cm/s
-                        heading_acc_est=0):  # deg
-        sync = b'\xb5\x62'
-        msg = {'class': b'\x01', 'id': b'\x12'}
-        body = msg['class'] + msg['id'] + b'\x24\x00'  # length of inner payload is 36 bytes
-        vel_n = int(vel_n).to_bytes(4, 'little')
-        vel_e = int(vel_e).to_bytes(4, 'little')
-        vel_d = int(vel_d).to_bytes(4, 'little')
-        speed = int(speed).to_bytes(4, 'little')
-        ground_speed = int(ground_speed).to_bytes(4, 'little')
-        heading = int(heading * 1e5).to_bytes(4, 'little')
-        speed_acc_est = int(speed_acc_est).to_bytes(4, 'little')
-        heading_acc_est = int(heading_acc_est * 1e5).to_bytes(4, 'little')
+                        heading_acc_est=0,  # deg
+                        burst=None):
         if time_of_week is None:
             time_of_week = self.get_time_of_week()
-        itow = time_of_week.to_bytes(4, 'little')
-        body += itow + vel_n + vel_e + vel_d + speed + ground_speed + heading
-        body += speed_acc_est + heading_acc_est
-        assert len(body) == (4+36), "Unexpected message body length."
-        cs = self.calc_fletcher_checksum(body)
-        msg['payload'] = sync + body + cs
-        print(f"<<< Sending {self.get_msg_code(msg)} message: {msg['payload']}")
-        print()  # Improve readability of log by adding an empty line
-        self.ser.write(msg['payload'])
+        self.send_message(NAV_VELNED_SCHEMA,
+                          time_of_week,
+                          int(vel_n), int(vel_e), int(vel_d),
+                          int(speed), int(ground_speed), int(heading * 1e5),
+                          int(speed_acc_est), int(heading_acc_est * 1e5),
+                          burst=burst)
 
     def send_nav_sol(self,
                      time_of_week=None,
                      frac_time_of_week=0,
                      week=0,
                      gps_fix=0,
-                     flags=b'\x00',
+                     flags=0,
                      ecef_x=0,
                      ecef_y=0,
                      ecef_z=0,
@@ -647,98 +2647,106 @@ class UbxGpsSimulator:
                      ecef_vz=0,
                      speed_acc_est=0,
                      pos_dop=0,
-                     num_sv=0):
-        sync = b'\xb5\x62'
-        msg = {'class': b'\x01', 'id': b'\x06'}
-        body = msg['class'] + msg['id'] + b'\x34\x00'  # length of inner payload is 52 bytes
-        frac_time_of_week = int(frac_time_of_week).to_bytes(4, 'little')
-        week = int(week).to_bytes(2, 'little')
-        gps_fix = int(gps_fix).to_bytes(1, 'little')
-        ecef_x = int(ecef_x).to_bytes(4, 'little', signed=True)
-        ecef_y = int(ecef_y).to_bytes(4, 'little', signed=True)
-        ecef_z = int(ecef_z).to_bytes(4, 'little', signed=True)
-        pos_acc_est = int(pos_acc_est).to_bytes(4, 'little', signed=False)
-        ecef_vx = int(ecef_vx).to_bytes(4, 'little', signed=True)
-        ecef_vy = int(ecef_vy).to_bytes(4, 'little', signed=True)
-        ecef_vz = int(ecef_vz).to_bytes(4, 'little', signed=True)
-        speed_acc_est = int(speed_acc_est).to_bytes(4, 'little', signed=False)
-        pos_dop = int(pos_dop * 100).to_bytes(2, 'little', signed=False)
-        num_sv = int(num_sv * 100).to_bytes(1, 'little', signed=False)
+                     num_sv=0,
+                     burst=None):
+        if time_of_week is None:
+            time_of_week = self.get_time_of_week()
+        self.send_message(NAV_SOL_SCHEMA,
+                          int(time_of_week), int(frac_time_of_week), int(week), int(gps_fix), int(flags),
+                          int(ecef_x), int(ecef_y), int(ecef_z), int(pos_acc_est),
+                          int(ecef_vx), int(ecef_vy), int(ecef_vz), int(speed_acc_est),
+                          int(pos_dop * 100), int(num_sv),
+                          burst=burst)
+
+    def send_nav_posecef(self,
+                         time_of_week=None,
+                         ecef_x=0,  # cm
+                         ecef_y=0,  # cm
+                         ecef_z=0,  # cm
+                         pos_acc_est=0,  # cm
+                         burst=None):
         if time_of_week is None:
             time_of_week = self.get_time_of_week()
-        itow = int(time_of_week).to_bytes(4, 'little')
-        body += itow + frac_time_of_week + week + gps_fix + flags
-        body += ecef_x + ecef_y + ecef_z + pos_acc_est
-        body += ecef_vx + ecef_vy + ecef_vz + speed_acc_est
-        body += pos_dop + b'\x00' + num_sv + b'\x00\x00\x00\x00'
-        assert len(body) == (4+52), "Unexpected message body length."
-        cs = self.calc_fletcher_checksum(body)
-        msg['payload'] = sync + body + cs
-        print(f"<<< Sending {self.get_msg_code(msg)} message: {msg['payload']}")
-        print()  # Improve readability of log by adding an empty line
-        self.ser.write(msg['payload'])
+        self.send_message(NAV_POSECEF_SCHEMA,
+                          time_of_week, int(ecef_x), int(ecef_y), int(ecef_z), int(pos_acc_est),
+                          burst=burst)
+
+    def send_nav_velecef(self,
+                         time_of_week=None,
+                         ecef_vx=0,  # cm/s
+                         ecef_vy=0,  # cm/s
+                         ecef_vz=0,  # cm/s
+                         speed_acc_est=0,  # cm/s
+                         burst=None):
+        if time_of_week is None:
+            time_of_week = self.get_time_of_week()
+        self.send_message(NAV_VELECEF_SCHEMA,
+                          time_of_week, int(ecef_vx), int(ecef_vy), int(ecef_vz), int(speed_acc_est),
+                          burst=burst)
 
     def send_nav_timegps(self,
                          time_of_week=None,
                          frac_time_of_week=0,
                          week=0,
                          leap_secs=0,
-                         valid=b'\x07',  # set time of week, week number and leap seconds to valid by default
-                         time_acc_est=0):
-        sync = b'\xb5\x62'
-        msg = {'class': b'\x01', 'id': b'\x20'}
-        body = msg['class'] + msg['id'] + b'\x10\x00'  # length of inner payload is 16 bytes
+                         valid=0x07,  # set time of week, week number and leap seconds to valid by default
+                         time_acc_est=0,
+                         burst=None):
         if time_of_week is None:
             time_of_week = self.get_time_of_week()
-        frac_time_of_week = int(frac_time_of_week).to_bytes(4, 'little')
-        week = int(week).to_bytes(2, 'little')
-        leap_secs = int(leap_secs).to_bytes(1, 'little')
-        time_acc_est = int(time_acc_est).to_bytes(4, 'little')
-        itow = time_of_week.to_bytes(4, 'little')
-        body += itow + frac_time_of_week + week + leap_secs + valid + time_acc_est
-        assert len(body) == (4+52), "Unexpected message body length."
-        cs = self.calc_fletcher_checksum(body)
-        msg['payload'] = sync + body + cs
-        print(f"<<< Sending {self.get_msg_code(msg)} message: {msg['payload']}")
-        print()  # Improve readability of log by adding an empty line
-        self.ser.write(msg['payload'])
+        self.send_message(NAV_TIMEGPS_SCHEMA,
+                          time_of_week, int(frac_time_of_week), int(week), int(leap_secs), int(valid),
+                          int(time_acc_est),
+                          burst=burst)
 
+    def send_nav_timeutc(self,
+                         time_of_week=None,
+                         time_acc_est=0,
+                         utc_time=None,  # datetime (UTC)
+                         nanos=0,  # nanoseconds of the second
+                         valid=0x07,  # set time of week, week number and UTC time to valid by default
+                         burst=None):
+        if time_of_week is None:
+            time_of_week = self.get_time_of_week()
+        if utc_time is None:
+            utc_time, nanos = self.time_base.utc(self.time_base.gps_ns())
+        self.send_message(NAV_TIMEUTC_SCHEMA,
+                          time_of_week, int(time_acc_est), int(nanos),
+                          utc_time.year, utc_time.month, utc_time.day,
+                          utc_time.hour, utc_time.minute, utc_time.second, int(valid),
+                          burst=burst)
+
+    @message_handler(0x06, 0x01, payload_lens=(2, 3, 8))
     def process_cfg_msg(self, msg):
-        assert msg['class'] == b'\x06' and msg['id'] == b'\x01', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len in [2, 3, 8], f"Unexpected {self.get_msg_code(msg)} " \
-                                         f"payload length (expecting 2, 3 or 8 bytes)."
-
-        pl_msg_class = msg['payload'][0]
-        pl_msg_id = msg['payload'][1]
-        pl_rate = msg['payload'][2:]  # Send rate is relative to the event a message is registered on
-        pl_msg = {'class': pl_msg_class.to_bytes(1, 'little'), 'id': pl_msg_id.to_bytes(1, 'little')}
-        pl_msg_code = self.get_msg_code(pl_msg)
-        print(f"    {self.get_msg_code(msg)} for class 0x{pl_msg_class:02X}, ID 0x{pl_msg_id:02X} ({pl_msg_code}).")
+        payload_len = len(msg.payload)
+
+        pl_msg_class = msg.payload[0]
+        pl_msg_id = msg.payload[1]
+        pl_rate = msg.payload[2:]  # Send rate is relative to the event a message is registered on
+        pl_msg_code = msg_code(pl_msg_class, pl_msg_id)
+        cfg_log.debug("    %s for class 0x%02X, ID 0x%02X (%s).",
+                      msg.code, pl_msg_class, pl_msg_id, pl_msg_code)
         if payload_len == 2:
-            print("      Poll message configuration. (TODO)")
-            # TODO: should queue reply with message configuration (ACK comes first)
-            # self.queue_reply(msg)
+            cfg_log.debug("      Poll message configuration.")
+            self.queue_poll_reply(msg.msg_class, msg.msg_id, 'msg', (0x06, 0x01, pl_msg_class, pl_msg_id),
+                                  lambda: self.msg_config(pl_msg_class, pl_msg_id))
         elif payload_len == 3:
-            print(f"      Rate for current target: {pl_rate}")
-            self.set_msg_rate(pl_msg_class, pl_msg_id, pl_rate)
+            cfg_log.debug("      Rate for current target: %s", pl_rate[0])
+            self.set_msg_rate(pl_msg_class, pl_msg_id, pl_rate[0])
         elif payload_len == 8:
-            print(f"      Rates for 6 I/O targets: "
-                  f"{pl_rate[0]}, "
-                  f"{pl_rate[1]}{'(*)' if self.io_target == 1 else ''}, ",
-                  f"{pl_rate[2]}{'(*)' if self.io_target == 2 else ''}, ",
-                  f"{pl_rate[4]}, "
-                  f"{pl_rate[4]}, "
-                  f"{pl_rate[5]}")
+            cfg_log.debug("      Rates for 6 I/O targets: %d, %d%s,  %d%s,  %d, %d, %d",
+                          pl_rate[0], pl_rate[1], '(*)' if self.io_target == 1 else '',
+                          pl_rate[2], '(*)' if self.io_target == 2 else '', pl_rate[3], pl_rate[4], pl_rate[5])
             # (where #0=DDC/I2C, #1=UART1, #2=UART2, #3=USB, #4=SPI, #5=reserved for future use)
 
             # contains info for us for sure
             self.set_msg_rate(pl_msg_class, pl_msg_id, pl_rate[self.io_target])
         return True  # allow caller to send ACK-ACK
 
-    def set_msg_rate(self, msg_class, msg_id, rate):
-        # add or overwrite message rate for specific class and ID
-        print(f"      Requested rate change: class=0x{msg_class:02X}, ID=0x{msg_id:02X}, rate={rate}")
+    def set_msg_rate(self, msg_class, msg_id, rate, check_budget=True):
+        # add or overwrite message rate for specific class and ID (without checking the line budget when setting
+        # several rates at once, the caller checks it afterwards)
+        cfg_log.debug("      Requested rate change: class=0x%02X, ID=0x%02X, rate=%s", msg_class, msg_id, rate)
 
         # check if message class is in dict, otherwise add it
         if msg_class not in self.message_rates:
@@ -746,13 +2754,19 @@ class UbxGpsSimulator:
         if msg_id not in self.message_rates[msg_class]:
             self.message_rates[msg_class][msg_id] = dict()
         self.message_rates[msg_class][msg_id]['rate'] = rate  # store "rate"
+        self.config_versions['msg'] += 1
+        self.epoch_renderer.invalidate()
+        if check_budget:
+            self.check_line_budget()
         # print(f"      Updated message rates to: {self.message_rates}")
 
-    def check_cyclic_tx(self, base_rate_count, msg_class, msg_id):
-        # message class and ID come in as 'bytes'
-        msg_class = int.from_bytes(msg_class, 'little')
-        msg_id = int.from_bytes(msg_id, 'little')
+    def msg_config(self, msg_class, msg_id):
+        # message configuration (CFG-MSG payload with the rates for all 6 I/O targets, only the simulated one is used)
+        rates = [0] * 6
+        rates[self.io_target] = self.message_rates.get(msg_class, {}).get(msg_id, {}).get('rate', 0)
+        return bytes([msg_class, msg_id] + rates)
 
+    def check_cyclic_tx(self, base_rate_count, msg_class, msg_id):
         if msg_class not in self.message_rates:
             return False
         if msg_id not in self.message_rates[msg_class]:
@@ -763,135 +2777,249 @@ class UbxGpsSimulator:
             return False
         return base_rate_count % self.message_rates[msg_class][msg_id]['rate'] == 0
 
+    @message_handler(0x06, 0x08, payload_lens=(0, 6))
+    def process_cfg_rate(self, msg):
+        payload_len = len(msg.payload)
+
+        cfg_log.debug("    %s (Navigation/Measurement Rate Settings)", msg.code)
+        if payload_len == 0:
+            cfg_log.debug("      Poll navigation/measurement rate settings.")
+            self.queue_poll_reply(msg.msg_class, msg.msg_id, 'rate', (0x06, 0x08), lambda: self.config_snapshot('rate'))
+            return True  # allow caller to send ACK-ACK
+
+        rate = CfgRate(msg.payload)
+        meas_rate, nav_rate, time_ref = rate.meas_rate, rate.nav_rate, rate.time_ref
+        cfg_log.debug("      Measurement rate:  %s [ms]", meas_rate)
+        cfg_log.debug("      Navigation rate:   %s [cycles]", nav_rate)
+        cfg_log.debug("      Time reference:    %s (%s time)", time_ref, 'GPS' if time_ref == 1 else 'UTC')
+        if meas_rate < self.meas_rate_millis_min or nav_rate < 1 or time_ref not in [0, 1]:
+            cfg_log.debug("      Unsupported settings (measurement rate must be at least %s ms).",
+                          self.meas_rate_millis_min)
+            return False  # caller shall send ACK-NAK
+        self.set_nav_rate(meas_rate, nav_rate, time_ref)
+        return True  # allow caller to send ACK-ACK
+
+    def set_nav_rate(self, meas_rate, nav_rate, time_ref):
+        self.meas_rate_millis = meas_rate
+        self.nav_rate = nav_rate
+        self.time_ref = time_ref
+        self.config_versions['rate'] += 1
+        if self.scheduler:
+            self.scheduler.set_period(self.base_period_millis(), self.gps_millis())
+            self.epoch_renderer.invalidate()
+            self.tx_wakeup.set()  # make TX thread (if any) reschedule
+        self.check_line_budget()
+
+    def base_period_millis(self):
+        # period of the navigation solutions, i.e. the base rate of all cyclic messages
+        return self.meas_rate_millis * self.nav_rate
+
+    def cyclic_data_rate(self):
+        # number of bytes per second required by the cyclic messages as currently configured
+        # (per second of real-time, i.e. simulating faster than real-time requires more bytes per second)
+        base_rate = 1000 / self.base_period_millis() * (self.time_base.speed if self.time_base else 1.0)
+        out_proto_mask = CfgPrt(self.config['prt']).out_proto_mask
+        data_rate = 0
+        for msg_class, ids in self.message_rates.items():
+            if not out_proto_mask & (0x0002 if msg_class == 0xF0 else 0x0001):
+                continue  # (protocol not output)
+            for msg_id, config in ids.items():
+                if not config.get('rate'):
+                    continue
+                if msg_class == 0xF0:
+                    sentence = nmea_sentences.get(msg_id)
+                    size = sentence.size if sentence else 0
+                else:
+                    entry = message_registry.get((msg_class, msg_id))
+                    schema = entry.schema if entry else None
+                    size = len(schema.header) + schema.payload_len + 2 if schema else 0
+                data_rate += size * base_rate / config['rate']
+        return data_rate
+
+    def check_line_budget(self):
+        # report if the cyclic messages do not fit into what the line can transmit at the configured baudrate; called
+        # on every change, so only the change from within the budget to over budget is reported
+        line_rate = self.ser.baudrate / 10  # 8N1, i.e. 10 bits per byte
+        data_rate = self.cyclic_data_rate()
+        overloaded = data_rate > line_rate
+        if overloaded and not self.line_overloaded:
+            log.warning("!!! Cyclic messages require %.0f bytes/s, but the line can only transmit "
+                        "%.0f bytes/s at %d baud (load: %.0f%%).",
+                        data_rate, line_rate, self.ser.baudrate, 100 * data_rate / line_rate)
+        self.line_overloaded = overloaded
+        return not overloaded
+
+    @message_handler(0x06, 0x09, payload_lens=(12, 13))
     def process_cfg_cfg(self, msg):
-        assert msg['class'] == b'\x06' and msg['id'] == b'\x09', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len in [12, 13], f"Unexpected {self.get_msg_code(msg)} " \
-                                        f"payload length (expecting 12 or 13 bytes)."
-
-        pl_clear_mask = msg['payload'][0:4]
-        pl_save_mask = msg['payload'][4:8]
-        pl_load_mask = msg['payload'][8:12]
+        payload_len = len(msg.payload)
+
+        cfg = CfgCfg(msg.payload)
         pl_device_mask = None
         if payload_len == 13:
-            pl_device_mask = msg['payload'][12]
+            pl_device_mask = msg.payload[12]
 
-        print(f"    {self.get_msg_code(msg)} (Clear, Save and Load configurations) ", end="")
-        if pl_device_mask:
-            print(f"with optional device mask: 0x{pl_device_mask:02X}.")
+        if cfg_log.isEnabledFor(logging.DEBUG):
+            if pl_device_mask:
+                cfg_log.debug("    %s (Clear, Save and Load configurations) with optional device mask: 0x%02X.",
+                              msg.code, pl_device_mask)
+            else:
+                cfg_log.debug("    %s (Clear, Save and Load configurations) w/o optional device mask.",
+                              msg.code)
+            cfg_log.debug("      Clear mask: 0x%08X", cfg.clear_mask)
+            cfg_log.debug("      Save mask:  0x%08X", cfg.save_mask)
+            cfg_log.debug("      Load mask:  0x%08X", cfg.load_mask)
+
+        # "clearing is done first, then saving, then loading" (the device mask is ignored, there is a single store)
+        for section in ConfigStore.sections_of(cfg.clear_mask):
+            self.config_store.clear(section)
+        saved = [section for section in ConfigStore.sections_of(cfg.save_mask)
+                 if self.config_store.save(section, self.config_snapshot(section))]
+        load_sections = ConfigStore.sections_of(cfg.load_mask)
+        cfg_log.debug("      Cleared: %s, saved: %s (changed only), loaded: %s",
+                      ', '.join(ConfigStore.sections_of(cfg.clear_mask)) or '(none)', ', '.join(saved) or '(none)',
+                      ', '.join(load_sections) or '(none)')
+        if 'prt' in load_sections:
+            # acknowledge at the current baudrate, the loaded port configuration may change it
+            self.send_ack_ack(msg.msg_class, msg.msg_id)
+        for section in load_sections:
+            content = self.config_store.load(section)
+            self.config_apply(section, self.default_config[section] if content is None else content)
+        return None if 'prt' in load_sections else True  # allow caller to send ACK-ACK (unless sent already)
+
+    def config_snapshot(self, section):
+        # current configuration of a section, encoded for the configuration store
+        if section == 'msg':
+            return b''.join(bytes((msg_class, msg_id, entry['rate']))
+                            for msg_class, entries in sorted(self.message_rates.items())
+                            for msg_id, entry in sorted(entries.items()) if entry['rate'])
+        if section == 'rate':
+            return CFG_RATE_SCHEMA.pack_payload(meas_rate=self.meas_rate_millis, nav_rate=self.nav_rate,
+                                                time_ref=self.time_ref)
+        return self.config[section]
+
+    def config_apply(self, section, content):
+        # make an encoded configuration of a section (see config_snapshot()) the current one
+        if section == 'msg':
+            self.message_rates = dict()
+            self.config_versions['msg'] += 1
+            self.epoch_renderer.invalidate()
+            for offset in range(0, len(content), 3):
+                self.set_msg_rate(*content[offset:offset + 3], check_budget=False)
+            self.check_line_budget()
+        elif section == 'rate':
+            rate = CfgRate(content)
+            self.set_nav_rate(rate.meas_rate, rate.nav_rate, rate.time_ref)
         else:
-            print(f"w/o optional device mask.")
-        print(f"      Clear mask: {pl_clear_mask}")
-        print(f"      Save mask:  {pl_save_mask}")
-        print(f"      Load mask:  {pl_load_mask}")
-        return True  # allow caller to send ACK-ACK
+            self.set_config(section, content)
+            if section == 'prt' and CfgPrt(content).baudrate != self.ser.baudrate:
+                self.reconfig_baudrate(CfgPrt(content).baudrate)
 
+    @message_handler(0x06, 0x16, payload_lens=(0, 8))
     def process_cfg_sbas(self, msg):
-        assert msg['class'] == b'\x06' and msg['id'] == b'\x16', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len in [0, 8], f"Unexpected {self.get_msg_code(msg)} payload length (expecting 0 or 8 bytes)."
+        payload_len = len(msg.payload)
 
-        print(f"    {self.get_msg_code(msg)} (SBAS Configuration)")
+        cfg_log.debug("    %s (SBAS Configuration)", msg.code)
         if payload_len == 0:
-            print("      Poll SBAS configuration.")
-            # TODO: should queue reply with SBAS configuration (ACK comes first)
-            # self.queue_reply(msg)
+            cfg_log.debug("      Poll SBAS configuration.")
+            self.queue_poll_reply(msg.msg_class, msg.msg_id, 'sbas', (0x06, 0x16), lambda: self.config['sbas'])
         else:
-            mode = msg['payload'][0]
-            usage = msg['payload'][1]
-            max_sbas = msg['payload'][2]
-            scan_mode2 = msg['payload'][3]
-            scan_mode1 = msg['payload'][4:8]
-            print(f"      Mode:      0x{mode:02X}")
-            print(f"      Usage:     0x{usage:02X}")
-            print(f"      Max. SBAS: {max_sbas}")
-            print(f"      scanmode2: {scan_mode2}")
-            print(f"      scanmode1: {scan_mode1}")
+            self.set_config('sbas', bytes(msg.payload))
+        if payload_len and cfg_log.isEnabledFor(logging.DEBUG):
+            sbas = CfgSbas(msg.payload)
+            cfg_log.debug("      Mode:      0x%02X", sbas.mode)
+            cfg_log.debug("      Usage:     0x%02X", sbas.usage)
+            cfg_log.debug("      Max. SBAS: %s", sbas.max_sbas)
+            cfg_log.debug("      scanmode2: 0x%02X", sbas.scan_mode2)
+            cfg_log.debug("      scanmode1: 0x%08X", sbas.scan_mode1)
         return True  # allow caller to send ACK-ACK
 
+    @message_handler(0x06, 0x07, payload_lens=(0, 20))
     def process_cfg_tp(self, msg):
-        assert msg['class'] == b'\x06' and msg['id'] == b'\x07', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len in [0, 20], f"Unexpected {self.get_msg_code(msg)} payload length (expecting 12 or 13 bytes)."
+        payload_len = len(msg.payload)
 
-        print(f"    {self.get_msg_code(msg)} (TimePulse Parameters)")
+        cfg_log.debug("    %s (TimePulse Parameters)", msg.code)
         if payload_len == 0:
-            print("      Poll message configuration.")
-            # TODO: should queue reply with message configuration (ACK comes first)
+            cfg_log.debug("      Poll message configuration.")
+            self.queue_poll_reply(msg.msg_class, msg.msg_id, 'tp', (0x06, 0x07), lambda: self.config['tp'])
         else:
-            interval = int.from_bytes(msg['payload'][0:4], 'little', signed=False)
-            length = int.from_bytes(msg['payload'][4:8], 'little', signed=False)
-            status = msg['payload'][8]  # FIXME: should be signed integer
-            time_ref = msg['payload'][9]
-            flags = msg['payload'][10]  # bitmask
-            # byte #11 is reserved
-            ant_cable_delay = int.from_bytes(msg['payload'][12:14], 'little', signed=True)
-            rf_group_delay = int.from_bytes(msg['payload'][14:16], 'little', signed=True)
-            user_delay = int.from_bytes(msg['payload'][16:20], 'little', signed=True)
-            print(f"      Interval:          {interval} [us]")
-            print(f"      Length:            {length} [us]")
-            print(f"      Status:            {status}")
-            print(f"      Time reference:    {time_ref}")
-            print(f"      Flags:             0x{flags:02X}")
-            print(f"        Sync mode:       {flags & 0x01}")
-            print(f"      Ant. cable delay:  {ant_cable_delay} [ns]")
-            print(f"      RX RF group delay: {rf_group_delay} [ns]")
-            print(f"      User delay:        {user_delay} [ns]")
+            self.set_config('tp', bytes(msg.payload))
+        if payload_len and cfg_log.isEnabledFor(logging.DEBUG):
+            tp = CfgTp(msg.payload)
+            cfg_log.debug("      Interval:          %s [us]", tp.interval)
+            cfg_log.debug("      Length:            %s [us]", tp.length)
+            cfg_log.debug("      Status:            %s", tp.status)
+            cfg_log.debug("      Time reference:    %s", tp.time_ref)
+            cfg_log.debug("      Flags:             0x%02X", tp.flags)
+            cfg_log.debug("        Sync mode:       %s", tp.flags & 1)
+            cfg_log.debug("      Ant. cable delay:  %s [ns]", tp.ant_cable_delay)
+            cfg_log.debug("      RX RF group delay: %s [ns]", tp.rf_group_delay)
+            cfg_log.debug("      User delay:        %s [ns]", tp.user_delay)
         return True  # allow caller to send ACK-ACK
 
+    @message_handler(0x06, 0x24, payload_lens=(0, 36))
     def process_cfg_nav5(self, msg):
-        assert msg['class'] == b'\x06' and msg['id'] == b'\x24', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len in [0, 36], f"Unexpected {self.get_msg_code(msg)} payload length (expecting 0 or 36 bytes)."
+        payload_len = len(msg.payload)
 
-        print(f"    {self.get_msg_code(msg)} (Navigation Engine Settings)")
+        cfg_log.debug("    %s (Navigation Engine Settings)", msg.code)
         if payload_len == 0:
-            print("      Poll message configuration.")
-            # TODO: should queue reply with message configuration (ACK comes first)
+            cfg_log.debug("      Poll message configuration.")
+            self.queue_poll_reply(msg.msg_class, msg.msg_id, 'nav5', (0x06, 0x24), lambda: self.config['nav5'])
         else:
-            mask = msg['payload'][0:2]
-            dyn_model = msg['payload'][2]
-            fix_mode = msg['payload'][3]
-            fixed_alt = msg['payload'][4:8]
-            fixed_alt_var = msg['payload'][8:12]
-            min_elev = msg['payload'][12]
-            dr_limit = msg['payload'][13]
-            pdop = msg['payload'][14:16]
-            tdop = msg['payload'][16:18]
-            pacc = msg['payload'][18:20]
-            tacc = msg['payload'][20:22]
-            static_hold_thres = msg['payload'][22]
-            dgps_timeout = msg['payload'][23]
-            # the remaining 12 bytes are currently marked reserved ("always set to zero")
-            print(f"      Mask: {mask}")
-            # TODO: continue...
+            self.set_config('nav5', self.merge_nav5(CfgNav5(self.config['nav5']), CfgNav5(msg.payload)))
+        if payload_len and cfg_log.isEnabledFor(logging.DEBUG):
+            nav5 = CfgNav5(msg.payload)
+            # (the remaining 12 bytes are currently marked reserved, "always set to zero")
+            cfg_log.debug("      Mask:              0x%04X", nav5.mask)
+            cfg_log.debug("      Dynamic model:     %s", nav5.dyn_model)
+            cfg_log.debug("      Fix mode:          %s", nav5.fix_mode)
+            cfg_log.debug("      Fixed altitude:    %.2f [m] (variance: %.4f [m^2])",
+                          nav5.fixed_alt * 0.01, nav5.fixed_alt_var * 0.0001)
+            cfg_log.debug("      Min. elevation:    %s [deg]", nav5.min_elev)
+            cfg_log.debug("      DR limit:          %s [s]", nav5.dr_limit)
+            cfg_log.debug("      PDOP/TDOP mask:    %.1f/%.1f", nav5.pdop * 0.1, nav5.tdop * 0.1)
+            cfg_log.debug("      P/T acc. mask:     %s [m]/%s [m]", nav5.pacc, nav5.tacc)
+            cfg_log.debug("      Static hold:       %s [cm/s]", nav5.static_hold_thresh)
+            cfg_log.debug("      DGPS timeout:      %s [s]", nav5.dgps_timeout)
         return True  # allow caller to send ACK-ACK
 
+    # fields of CFG-NAV5 applied by each bit of its mask
+    nav5_mask_fields = [('dyn_model',), ('min_elev',), ('fix_mode', 'fixed_alt', 'fixed_alt_var'), ('dr_limit',),
+                        ('pdop', 'pacc'), ('tdop', 'tacc'), ('static_hold_thresh',), ('dgps_timeout',)]
+
+    def merge_nav5(self, current, requested):
+        # "only the masked parameters will be applied"
+        values = current.values()
+        for bit, field_names in enumerate(self.nav5_mask_fields):
+            if requested.mask & (1 << bit):
+                values.update((field_name, getattr(requested, field_name)) for field_name in field_names)
+        return CFG_NAV5_SCHEMA.pack_payload(**values)
+
+    @message_handler(0x06, 0x02, payload_lens=(1, range(10, 70, 10)))
     def process_cfg_inf(self, msg):
-        assert msg['class'] == b'\x06' and msg['id'] == b'\x02', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len in [1, 10, 20, 30, 40, 50, 60], \
-            f"Unexpected {self.get_msg_code(msg)} payload length (expecting 1 or " \
-            f"multiple of 10 bytes)."
+        payload_len = len(msg.payload)
 
-        print(f"    {self.get_msg_code(msg)}")
+        cfg_log.debug("    %s", msg.code)
         num_targets = payload_len // 10
         if payload_len == 1:
-            protocol_id = msg['payload'][0]
+            protocol_id = msg.payload[0]
             self.print_protocol_id(protocol_id)
-            # TODO: this is a poll request, i.e. excepts an answer
-            # self.queue_reply(msg)
+            current = self.config['inf']
+            blocks = {current[offset]: current[offset:offset + 10] for offset in range(0, len(current), 10)}
+            if protocol_id not in blocks:
+                return False  # caller shall send ACK-NAK (unsupported protocol)
+            self.queue_poll_reply(msg.msg_class, msg.msg_id, 'inf', (0x06, 0x02, protocol_id),
+                                  lambda: blocks[protocol_id])
         else:
+            # current configuration with one block per protocol, replaced by the blocks received
+            current = self.config['inf']
+            blocks = {current[offset]: current[offset:offset + 10] for offset in range(0, len(current), 10)}
             for target_id in range(0, num_targets):  # blocks for "I/O target" aka "configuration unit"
-                print(f"      Target ID: #{target_id}", end="")
-                if target_id == self.io_target:
-                    print("      (*)")  # print marker that info is relevant for us; FIXME: do make use of it
-                else:
-                    print()
-                protocol_id = msg['payload'][target_id*10 + 0]
-                self.print_protocol_id(protocol_id)
-                # inf_msg_msk = msg['payload'][target_id*10 + 4:(target_id+1)*10]  # 6 bytes
-                inf_msg_msk = msg['payload'][target_id * 10 + 5]  # only 1 byte contains information
+                # print marker that info is relevant for us; FIXME: do make use of it
+                cfg_log.debug("      Target ID: #%d%s", target_id, "      (*)" if target_id == self.io_target else "")
+                inf = CfgInf(msg.payload[target_id * 10:(target_id + 1) * 10])
+                blocks[inf.protocol_id] = bytes(inf.payload)
+                self.print_protocol_id(inf.protocol_id)
+                inf_msg_msk = inf.inf_msg_mask_uart1  # only 1 byte contains information
                 enabled_info_msg = []
                 disabled_info_msg = []
                 if inf_msg_msk & 0x01 == 0x01:
@@ -914,92 +3042,256 @@ class UbxGpsSimulator:
                     enabled_info_msg.append('TEST')
                 else:
                     disabled_info_msg.append('TEST')
-                print(f"      Enabled messages:  {', '.join(enabled_info_msg) if enabled_info_msg else '(none)'}")
-                print(f"      Disabled messages: {', '.join(disabled_info_msg) if disabled_info_msg else '(none)'}")
+                cfg_log.debug("      Enabled messages:  %s",
+                              ', '.join(enabled_info_msg) if enabled_info_msg else '(none)')
+                cfg_log.debug("      Disabled messages: %s",
+                              ', '.join(disabled_info_msg) if disabled_info_msg else '(none)')
+            self.set_config('inf', b''.join(blocks[protocol_id] for protocol_id in sorted(blocks)))
         return True  # allow caller to send ACK-ACK
 
+    @message_handler(0x06, 0x34, payload_lens=(0, range(2, 0x10000)))
     def process_cfg_rinv(self, msg):
-        assert msg['class'] == b'\x06' and msg['id'] == b'\x34', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len == 0 or payload_len >= 2, "Unexpected payload length"
+        payload_len = len(msg.payload)
 
-        print(f"    {self.get_msg_code(msg)} (remote inventory)")
+        cfg_log.debug("    %s (remote inventory)", msg.code)
         if payload_len == 0:
-            print("    Poll request.")
-            # TODO: should queue reply with message configuration (ACK comes first)
+            cfg_log.debug("    Poll request.")
             # Note: the default is: flags=0x00, data="Notice: no data saved!"
-            payload = b'\x00Notice: no data saved!'
-            msg = {
-                'class': msg['class'],
-                'id': msg['id'],
-                'payload': payload
-            }
-            self.queue_reply(msg)
+            self.queue_poll_reply(msg.msg_class, msg.msg_id, 'rinv', (0x06, 0x34), lambda: self.config['rinv'])
         elif payload_len >= 2:
-            flags = msg['payload'][0]
-            data = msg['payload'][1:31]  # "If N is greater than 30, the excess bytes are discarded"
+            flags = msg.payload[0]
+            data = bytes(msg.payload[1:31])  # "If N is greater than 30, the excess bytes are discarded"
+            self.set_config('rinv', bytes((flags,)) + data)
             is_binary = True if flags & 0x2 else False
             dump = True if flags & 0x1 else False  # dump data at startup (does not work if flag 'binary' is set)
-            print(f"      Flags: binary={is_binary}, dump={dump}.")
-            print(f"      Data: {data}")
+            cfg_log.debug("      Flags: binary=%s, dump=%s.", is_binary, dump)
+            cfg_log.debug("      Data: %s", data)
             if not is_binary:
-                print(f"      Data (textual): '{data.decode('ascii')}'")
+                cfg_log.debug("      Data (textual): '%s'", data.decode('ascii'))
         return True  # allow caller to send ACK-ACK
 
+    @message_handler(0x06, 0x04, payload_lens=(4,))
     def process_cfg_rst(self, msg):
-        assert msg['class'] == b'\x06' and msg['id'] == b'\x04', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len == 4, "Unexpected payload length"
-
-        print(f"    {self.get_msg_code(msg)} (reset receiver/ clear backup data structure command).")
-        nav_bbr_mask = msg['payload'][0:2]
+        cfg_log.debug("    %s (reset receiver/ clear backup data structure command).", msg.code)
+        rst = CfgRst(msg.payload)
         nav_bbr_mask_special = ''
         # check three special values to append textual representation
-        if nav_bbr_mask == b'\x00\x00':
+        if rst.nav_bbr_mask == 0x0000:
             nav_bbr_mask_special = ' (hotstart)'
-        elif nav_bbr_mask == b'\x00\x01':
+        elif rst.nav_bbr_mask == 0x0001:
             nav_bbr_mask_special = ' (warmstart)'
-        elif nav_bbr_mask == b'\xff\xff':
+        elif rst.nav_bbr_mask == 0xFFFF:
             nav_bbr_mask_special = ' (coldstart)'
-        reset_mode = msg['payload'][2]
-        reserved1 = msg['payload'][3]
-        print(f"      navBbrMask: {nav_bbr_mask}{nav_bbr_mask_special}")
-        print(f"      resetMode:  {reset_mode}")
-        print(f"      reserved1:  {reserved1}")
+        cfg_log.debug("      navBbrMask: 0x%04X%s", rst.nav_bbr_mask, nav_bbr_mask_special)
+        cfg_log.debug("      resetMode:  %s", rst.reset_mode)
         return True  # allow caller to send ACK-ACK
 
+    @message_handler(0x0A, 0x04, payload_lens=(0,))
     def process_mon_ver(self, msg):
-        assert msg['class'] == b'\x0A' and msg['id'] == b'\x04', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len == 0, "Unexpected payload length"
-        # or payload_len >= 70 -- nope, does not make sense to support a setter
-
-        print(f"    {self.get_msg_code(msg)} (Receiver/Software/ROM Version, poll request)")
-        # TODO: should queue reply with message configuration (ACK comes first)
-        # sw_version = ... # 30 characters, NULL-terminated
-        # hw_version = ... # 10 characters, NULL-terminated
-        # rom_version = ... # 30 characters, NULL-terminated
-        # extension = ... # optional extension data
+        # (payload lengths >= 70 not accepted -- nope, does not make sense to support a setter)
+        mon_log.debug("    %s (Receiver/Software/ROM Version, poll request)", msg.code)
+        # (strings are NULL-terminated, i.e. padded with zeros; no optional extension data)
+        self.queue_poll_reply(msg.msg_class, msg.msg_id, None, (0x0A, 0x04), lambda: MON_VER_SCHEMA.pack_payload(
+            sw_version=self.sw_version, hw_version=self.hw_version, rom_version=self.rom_version))
 
+    @message_handler(0x0B, 0x32, payload_lens=(range(16, 0x10000),))
     def process_aid_alpsrv(self, msg):
-        assert msg['class'] == b'\x0B' and msg['id'] == b'\x32', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len >= 8, "Unexpected payload length (must be >=8 bytes)"
-        print(f"    {self.get_msg_code(msg)} (ALP server/client AlmanacPlus data; TODO)")
-        # TODO/FIXME
-
+        # ALP server: data requests of the ALP client are answered from the ALP file uploaded before,
+        # data sent by the client (type 0xFF) updates the file
+        srv = AidAlpsrv(msg.payload)
+        aid_log.debug("    %s (ALP server/client AlmanacPlus data): type 0x%02X, offset %d words, size %d words, "
+                      "file ID %d, %d data bytes", msg.code, srv.type, srv.ofs, srv.size, srv.file_id, srv.data_size)
+        if self.alp_file is None:
+            aid_log.debug("      No ALP file uploaded (AID-ALP), nothing to serve.")
+            return None
+        if srv.type == 0xFF:
+            self.alp_file.write(srv.ofs * 2, msg.payload[AID_ALPSRV_SCHEMA.payload_len:][:srv.data_size])
+            return None
+        data = self.alp_file.read(srv.ofs * 2, srv.size * 2)
+        values = srv.values()
+        values['data_size'] = len(data)
+        self.queue_reply(UbxFrame(msg.msg_class, msg.msg_id, AID_ALPSRV_SCHEMA.pack_payload(**values) + data))
+        return None
+
+    # (even-sized or 1; larger payloads would exceed the receiver's internal buffering capabilities)
+    @message_handler(0x0B, 0x50, payload_lens=(1, range(0, 701, 2)))
     def process_aid_alp(self, msg):
-        assert msg['class'] == b'\x0b' and msg['id'] == b'\x50', "Unexpected call."
-        payload_len = len(msg['payload'])
-        assert payload_len % 2 == 0 or payload_len == 1, "Unexpected payload length (must be even-sized or 1)"
-        assert payload_len <= 700, "Payload too large"  # would exceed the receiver's internal buffering capabilities
+        payload_len = len(msg.payload)
 
-        print(f"    {self.get_msg_code(msg)} (ALP file data transfer to the receiver)")
         if payload_len == 1:
-            assert(msg['payload'][0] == b'\x00')
-            print("      Marking end of transfer.")
-        else:
-            print(f"      ALP file data: {msg['payload']}")
+            # end of transfer (the single byte is a dummy, i.e. its value is ignored)
+            upload, self.alp_upload = self.alp_upload, None
+            aid_log.debug("    %s (ALP file data transfer to the receiver)", msg.code)
+            aid_log.debug("      Marking end of transfer.")
+            if upload is None:
+                aid_log.warning("!!! Received end of ALP file transfer without any data")
+            elif upload.finish():
+                self.alp_file = upload
+                aid_log.info("ALP file received: %d bytes (CRC-32: 0x%08X) at %.0f bytes/s",
+                             upload.size, upload.crc, upload.throughput())
+            else:
+                aid_log.warning("!!! Incomplete ALP file transfer: %d of %s bytes received",
+                                upload.size, upload.expected_size)
+            return None
+
+        # data transfer: acknowledged (AID-ALP with 'ACK' or 'NAK', not ACK-ACK) as soon as the chunk is stored
+        if payload_len == 0:
+            # (a client bug: neither starts a transfer nor changes the current one)
+            self.send_message(AID_ALP_ACK_SCHEMA, 0x00)
+            aid_log.warning("!!! Received ALP file data without any data, rejected")
+            return None
+        if self.alp_upload is None:
+            self.alp_upload = AlpFile()
+        accepted = self.alp_upload.add(msg.payload)
+        self.send_message(AID_ALP_ACK_SCHEMA, 0x01 if accepted else 0x00)
+        if not accepted:
+            aid_log.warning("!!! ALP file data exceeds the file size (%s bytes), aborting transfer",
+                            self.alp_upload.expected_size)
+            self.alp_upload = None
+        elif aid_log.isEnabledFor(logging.DEBUG):
+            aid_log.debug("    %s (ALP file data transfer to the receiver)", msg.code)
+            aid_log.debug("      ALP file data: %d bytes (%d bytes received so far)", payload_len, self.alp_upload.size)
+        return None
+
+
+# schemas of the messages which are encoded by the simulator (field names follow the specification)
+ACK_NAK_SCHEMA = register_schema(b'\x05', b'\x00', [('cls_id', 'B'), ('msg_id', 'B')])
+ACK_ACK_SCHEMA = register_schema(b'\x05', b'\x01', [('cls_id', 'B'), ('msg_id', 'B')])
+NAV_POSECEF_SCHEMA = register_schema(b'\x01', b'\x01', [
+    ('itow', 'I'), ('ecef_x', 'i'), ('ecef_y', 'i'), ('ecef_z', 'i'), ('pacc', 'I')])
+NAV_POSLLH_SCHEMA = register_schema(b'\x01', b'\x02', [
+    ('itow', 'I'), ('lon', 'i'), ('lat', 'i'), ('height', 'i'), ('hmsl', 'i'), ('hacc', 'I'), ('vacc', 'I')])
+NAV_STATUS_SCHEMA = register_schema(b'\x01', b'\x03', [
+    ('itow', 'I'), ('gps_fix', 'B'), ('flags', 'B'), ('fix_stat', 'B'), ('flags2', 'B'), ('ttff', 'I'),
+    ('msss', 'I')])
+NAV_DOP_SCHEMA = register_schema(b'\x01', b'\x04', [
+    ('itow', 'I'), ('gdop', 'H'), ('pdop', 'H'), ('tdop', 'H'), ('vdop', 'H'), ('hdop', 'H'), ('ndop', 'H'),
+    ('edop', 'H')])
+NAV_SOL_SCHEMA = register_schema(b'\x01', b'\x06', [
+    ('itow', 'I'), ('ftow', 'i'), ('week', 'h'), ('gps_fix', 'B'), ('flags', 'B'),
+    ('ecef_x', 'i'), ('ecef_y', 'i'), ('ecef_z', 'i'), ('pacc', 'I'),
+    ('ecef_vx', 'i'), ('ecef_vy', 'i'), ('ecef_vz', 'i'), ('sacc', 'I'),
+    ('pdop', 'H'), (None, 'x'), ('num_sv', 'B'), (None, '4x')])
+NAV_VELNED_SCHEMA = register_schema(b'\x01', b'\x12', [
+    ('itow', 'I'), ('vel_n', 'i'), ('vel_e', 'i'), ('vel_d', 'i'), ('speed', 'I'), ('gspeed', 'I'),
+    ('heading', 'i'), ('sacc', 'I'), ('cacc', 'I')])
+CFG_RATE_SCHEMA = register_schema(b'\x06', b'\x08', [('meas_rate', 'H'), ('nav_rate', 'H'), ('time_ref', 'H')])
+NAV_VELECEF_SCHEMA = register_schema(b'\x01', b'\x11', [
+    ('itow', 'I'), ('ecef_vx', 'i'), ('ecef_vy', 'i'), ('ecef_vz', 'i'), ('sacc', 'I')])
+NAV_TIMEGPS_SCHEMA = register_schema(b'\x01', b'\x20', [
+    ('itow', 'I'), ('ftow', 'i'), ('week', 'h'), ('leap_s', 'b'), ('valid', 'B'), ('tacc', 'I')])
+NAV_TIMEUTC_SCHEMA = register_schema(b'\x01', b'\x21', [
+    ('itow', 'I'), ('tacc', 'I'), ('nano', 'i'), ('year', 'H'), ('month', 'B'), ('day', 'B'),
+    ('hour', 'B'), ('min', 'B'), ('sec', 'B'), ('valid', 'B')])
+MON_VER_SCHEMA = register_schema(b'\x0A', b'\x04', [
+    ('sw_version', '30s'), ('hw_version', '10s'), ('rom_version', '30s')])
+AID_ALP_ACK_SCHEMA = register_schema(b'\x0B', b'\x50', [('ack_type', 'B')])  # (ACK: 0x01, NAK: 0x00)
+AID_ALPSRV_SCHEMA = register_schema(b'\x0B', b'\x32', [
+    ('id_size', 'B'), ('type', 'B'), ('ofs', 'H'), ('size', 'H'), ('file_id', 'H'), ('data_size', 'H'), ('id1', 'B'),
+    ('id2', 'B'), ('id3', 'I')])
+
+# schemas of the CFG messages which are decoded by the simulator (and encoded in replies to poll requests);
+# the signedness of the fields follows the specification, bitfields are unsigned
+CFG_PRT_SCHEMA = register_schema(b'\x06', b'\x00', [  # (layout of the UART ports)
+    ('port_id', 'B'), (None, 'x'), ('tx_ready', 'H'), ('mode', 'I'), ('baudrate', 'I'), ('in_proto_mask', 'H'),
+    ('out_proto_mask', 'H'), (None, '4x')])
+CFG_INF_SCHEMA = register_schema(b'\x06', b'\x02', [  # (one block per protocol, i.e. 10 bytes)
+    ('protocol_id', 'B'), (None, '3x'), ('inf_msg_mask_ddc', 'B'), ('inf_msg_mask_uart1', 'B'),
+    ('inf_msg_mask_uart2', 'B'), ('inf_msg_mask_usb', 'B'), ('inf_msg_mask_spi', 'B'), (None, 'x')])
+CFG_RST_SCHEMA = register_schema(b'\x06', b'\x04', [('nav_bbr_mask', 'H'), ('reset_mode', 'B'), (None, 'x')])
+CFG_TP_SCHEMA = register_schema(b'\x06', b'\x07', [
+    ('interval', 'I'), ('length', 'I'), ('status', 'b'), ('time_ref', 'B'), ('flags', 'B'), (None, 'x'),
+    ('ant_cable_delay', 'h'), ('rf_group_delay', 'h'), ('user_delay', 'i')])
+CFG_CFG_SCHEMA = register_schema(b'\x06', b'\x09', [  # (without the optional device mask)
+    ('clear_mask', 'I'), ('save_mask', 'I'), ('load_mask', 'I')])
+CFG_SBAS_SCHEMA = register_schema(b'\x06', b'\x16', [
+    ('mode', 'B'), ('usage', 'B'), ('max_sbas', 'B'), ('scan_mode2', 'B'), ('scan_mode1', 'I')])
+CFG_NAV5_SCHEMA = register_schema(b'\x06', b'\x24', [
+    ('mask', 'H'), ('dyn_model', 'B'), ('fix_mode', 'B'), ('fixed_alt', 'i'), ('fixed_alt_var', 'I'),
+    ('min_elev', 'b'), ('dr_limit', 'B'), ('pdop', 'H'), ('tdop', 'H'), ('pacc', 'H'), ('tacc', 'H'),
+    ('static_hold_thresh', 'B'), ('dgps_timeout', 'B'), (None, '12x')])
+
+# typed views of received payloads (see UbxPayloadView)
+CfgPrt = CFG_PRT_SCHEMA.view_class
+CfgInf = CFG_INF_SCHEMA.view_class
+CfgRst = CFG_RST_SCHEMA.view_class
+CfgTp = CFG_TP_SCHEMA.view_class
+CfgRate = CFG_RATE_SCHEMA.view_class
+CfgCfg = CFG_CFG_SCHEMA.view_class
+CfgSbas = CFG_SBAS_SCHEMA.view_class
+CfgNav5 = CFG_NAV5_SCHEMA.view_class
+AidAlpsrv = AID_ALPSRV_SCHEMA.view_class
+
+# templates of the NMEA sentences which are generated by the simulator (NMEA 2.3, as output by u-blox 6 receivers),
+# in the order of transmission within an epoch
+NMEA_TIME = b'%(hour)02d%(minute)02d%(second)02d.%(centis)02d'
+NMEA_DATE = b'%(day)02d%(month)02d%(year)02d'
+NMEA_POSITION = b'%(lat_deg)02d%(lat_min)02d.%(lat_frac)05d,%(ns)c,%(lon_deg)03d%(lon_min)02d.%(lon_frac)05d,%(ew)c'
+NMEA_RMC_SENTENCE = register_sentence(
+    0x04,
+    NMEA_TIME + b',A,' + NMEA_POSITION + b',%(speed_knots).3f,%(course).2f,' + NMEA_DATE + b',,,A',
+    NMEA_TIME + b',V,,,,,,,' + NMEA_DATE + b',,,N')
+NMEA_VTG_SENTENCE = register_sentence(
+    0x05,
+    b'%(course).2f,T,,M,%(speed_knots).3f,N,%(speed_kmh).3f,K,A',
+    b',,,,,,,,N')
+NMEA_GGA_SENTENCE = register_sentence(
+    0x00,
+    NMEA_TIME + b',' + NMEA_POSITION + b',1,%(num_sv)02d,%(dop).2f,%(height).1f,M,0.0,M,,',
+    NMEA_TIME + b',,,,,0,%(num_sv)02d,%(dop).2f,,,,,,')
+NMEA_GSA_SENTENCE = register_sentence(
+    0x02,
+    b'A,%(fix_mode)d,,,,,,,,,,,,,%(dop).2f,%(dop).2f,%(dop).2f')  # (no satellites used)
+NMEA_GSV_SENTENCE = register_sentence(
+    0x03,
+    b'1,1,%(num_sv)02d')  # (no satellites in view)
+NMEA_GLL_SENTENCE = register_sentence(
+    0x01,
+    NMEA_POSITION + b',' + NMEA_TIME + b',A,A',
+    b',,,,' + NMEA_TIME + b',V,N')
+
+
+def run_multiple(simulators):
+    # serve many simulated receivers from a single thread, i.e. from one event loop waiting for all ports at once
+    # (instead of one process per receiver, each one polling its port)
+    selector = selectors.DefaultSelector()
+    registered = dict()  # file descriptor (and its generation) registered for each simulator
+    for simulator in simulators:
+        simulator.start()
+        simulator.ser.timeout = 0  # never block on reads, waiting is done by the selector
+
+    while True:
+        # (re-)register transports whose file descriptor has changed (e.g. when a TCP client has connected)
+        for simulator in simulators:
+            fd = (simulator.ser.fileno(), simulator.ser.fd_generation)
+            if registered.get(simulator) != fd:
+                if simulator in registered:
+                    selector.unregister(registered[simulator][0])
+                selector.register(fd[0], selectors.EVENT_READ, simulator)
+                registered[simulator] = fd
+
+        # wait for received data, but at most until the next cyclic transmission or paced data is due
+        delay = min(simulator.time_base.real_seconds(simulator.scheduler.next_tick_millis()
+                                                     - simulator.gps_millis())
+                    for simulator in simulators)
+        release_times = [release_time for release_time in (simulator.ser.release_time() for simulator in simulators)
+                         if release_time is not None]
+        if release_times:
+            delay = min(delay, min(release_times) - time.monotonic())
+        time_base = simulators[0].time_base
+        if time_base.virtual:
+            # the (shared) virtual time advances to the next cyclic transmission once all simulators are idle
+            if all(simulator.is_idle() for simulator in simulators):
+                time_base.advance_to(min(simulator.scheduler.next_tick_millis() for simulator in simulators))
+            else:
+                delay = time_base.poll_time
+        for key, _ in selector.select(max(delay, 0)):
+            key.data.process_rx()
+
+        for simulator in simulators:
+            simulator.send_queued_replies()
+            simulator.process_cyclic_tx(simulator.gps_millis())
+            simulator.release_tx()
 
 
 def run():
@@ -1010,14 +3302,30 @@ def run():
     io_target_default = 1
 
     # blocking time (in seconds) for every blocking read; has influence of the jitter of the periodic transmits
-    # (as this script is currently single-threaded and switches between receiving and transmitting)
+    # (unless running concurrently, the script is single-threaded and switches between receiving and transmitting)
     blocking_read_timeout = 0.01
 
     parser = argparse.ArgumentParser(description='%(prog)s '
                                                  'Run simulated UBX GPX receiver.')
 
-    parser.add_argument(dest='serial_port_name',
-                        help='Serial port name')
+    parser.add_argument(dest='serial_port_names',
+                        nargs='*',
+                        metavar='serial_port_name',
+                        help='Serial port name(s) or, depending on the transport, \'[host:]port\' to listen on '
+                             '(TCP) or \'[broadcast address:]port\' to send to (UDP); '
+                             'one simulated receiver is run per port')
+
+    parser.add_argument('-T', '--transport',
+                        choices=['serial', 'tcp', 'udp'],
+                        help='Transport used for the given port(s) (default: serial); the UDP transport receives '
+                             'on the port following the broadcast port',
+                        default='serial')
+
+    parser.add_argument('-n', '--pty-count',
+                        type=int,
+                        help='Number of pseudo-terminals to create, one simulated receiver is run per '
+                             'pseudo-terminal (default: 0)',
+                        default=0)
 
     parser.add_argument('-b', '--serial-baudrate',
                         type=int,
@@ -1034,17 +3342,160 @@ def run():
                              f"possible: {', '.join(str(t) for t in io_targets_accepted)})",
                         default=io_target_default)
 
+    parser.add_argument('-p', '--pacing',
+                        action='store_true',
+                        help='Limit the output data rate of pseudo-terminals and network transports to the '
+                             'configured baudrate')
+
+    parser.add_argument('-r', '--track',
+                        help='Track to play back (GPX file or CSV file with the columns time, lat, lon and optionally '
+                             'height; requires NumPy)')
+
+    parser.add_argument('-l', '--loop-track',
+                        action='store_true',
+                        help='Restart track playback or replay when the end of the track or log has been reached')
+
+    parser.add_argument('-R', '--replay',
+                        help='Recorded raw UBX log (e.g. of a real receiver) to replay with its original timing '
+                             'instead of simulating NAV messages')
+
+    parser.add_argument('-S', '--replay-seek',
+                        type=float,
+                        help='Start replaying at the given time (in seconds since the first epoch of the log; '
+                             'default: 0)',
+                        default=0.0)
+
+    parser.add_argument('-v', '--verbosity',
+                        type=parse_verbosity,
+                        action='append',
+                        help='Log level (debug: decoded messages, info: one line per frame, warning, error) for all '
+                             'messages or, given as \'CLASS=LEVEL\', for messages about frames of one message class '
+                             '(e.g. NAV=warning); may be given several times (default: debug)',
+                        default=[])
+
+    parser.add_argument('-q', '--quiet',
+                        action='store_true',
+                        help='Do not log anything about received and transmitted frames (only startup messages '
+                             'and warnings)')
+
+    parser.add_argument('-w', '--record',
+                        help='Record all received and transmitted frames to the given file (with several simulated '
+                             'receivers, the receiver\'s number is appended); see dump_recording.py')
+
+    parser.add_argument('-C', '--config-dir',
+                        help='Directory holding the permanent configuration saved and loaded by CFG-CFG (with several '
+                             'simulated receivers, the receiver\'s number is appended; default: kept in memory only)')
+
+    parser.add_argument('-m', '--metrics',
+                        help='Serve metrics (frame counters, queued replies, handler times, lateness of the cyclic '
+                             'transmissions) via HTTP in the Prometheus text format on \'[host:]port\' or on a Unix '
+                             'socket (given as path)')
+
+    parser.add_argument('-D', '--metrics-dump',
+                        help='Append a snapshot of the metrics (JSON, one line per snapshot) to the given file '
+                             'periodically')
+
+    parser.add_argument('-I', '--metrics-interval',
+                        type=float,
+                        help='Interval of the metrics snapshots in seconds (default: 10)',
+                        default=10.0)
+
+    parser.add_argument('-e', '--start-epoch',
+                        type=GpsTimeBase.parse_epoch,
+                        help='Simulated date and time at startup (ISO 8601, UTC unless given with an offset, e.g. '
+                             '2024-05-01T12:00:00Z; default: now)')
+
+    parser.add_argument('-s', '--speed',
+                        type=GpsTimeBase.parse_speed,
+                        help='Factor by which the simulated time passes faster than real-time or \'max\' to '
+                             'advance it to the next epoch as soon as all data has been processed (default: 1.0)',
+                        default=1.0)
+
+    parser.add_argument('-L', '--lock-step',
+                        action='store_true',
+                        help='Advance the simulated time to the next epoch as soon as the client has read all data '
+                             'transmitted so far (implies \'-s max\')')
+
+    parser.add_argument('-c', '--concurrent',
+                        action='store_true',
+                        help='Run reception, command processing and cyclic transmission in separate threads '
+                             '(reduces the jitter of the cyclic transmissions)')
+
+    parser.add_argument('-P', '--plugin',
+                        action='append',
+                        help='Import a module (by module name or Python file name) registering additional message '
+                             'handlers; may be given multiple times',
+                        default=[])
+
     args = parser.parse_args()
 
     assert args.serial_baudrate in baudrates_accepted, "Invalid baudrate selected."
     assert args.io_target in io_targets_accepted, "Invalid I/O target selected."
-
-    simulator = UbxGpsSimulator(serial_port_name=args.serial_port_name,
-                                serial_baudrate=args.serial_baudrate,
-                                serial_baudrates_accepted=baudrates_accepted,
-                                serial_blocking_read_timeout=blocking_read_timeout,
-                                io_target=args.io_target)
-    simulator.run()
+    assert args.serial_port_names or args.pty_count > 0, "No serial port name and no pseudo-terminals given."
+    assert args.speed > 0, "Invalid speed factor selected."
+
+    setup_logging(args.verbosity, args.quiet)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # (complete logs and recordings when terminated)
+    for plugin in args.plugin:
+        load_plugin(plugin)
+    transports = [open_transport(args.transport, port_name, args.serial_baudrate, blocking_read_timeout, args.pacing)
+                  for port_name in args.serial_port_names]
+    transports += [open_transport('pty', None, args.serial_baudrate, blocking_read_timeout, args.pacing)
+                   for _ in range(args.pty_count)]
+    simulators = [UbxGpsSimulator(serial_port_name=transport.name,
+                                  serial_baudrate=args.serial_baudrate,
+                                  serial_baudrates_accepted=baudrates_accepted,
+                                  serial_blocking_read_timeout=blocking_read_timeout,
+                                  io_target=args.io_target,
+                                  transport=transport)
+                  for transport in transports]
+    assert not (args.track and args.replay), "Either play back a track or replay a log."
+    if args.track:
+        trajectory = Trajectory.load(args.track, loop=args.loop_track)
+        for simulator in simulators:
+            simulator.trajectory = trajectory
+    if args.replay:
+        replay_log = UbxLog(args.replay, loop=args.loop_track)
+        replay_log.seek(args.replay_seek)
+        log.info("Replaying %d frames in %d epochs from '%s' (starting at %.3f s).",
+                 len(replay_log.frame_offsets), len(replay_log.epoch_times), args.replay,
+                 replay_log.epoch_times[replay_log.start] / 1000)
+        for simulator in simulators:
+            simulator.replay = replay_log
+    # all receivers share the same time
+    if args.lock_step or math.isinf(args.speed):
+        assert not args.concurrent, "Concurrent mode is not available with virtual time."
+        time_base = VirtualTimeBase(start_epoch=args.start_epoch, lock_step=args.lock_step)
+    else:
+        time_base = GpsTimeBase(start_epoch=args.start_epoch, speed=args.speed)
+    for simulator in simulators:
+        simulator.time_base = time_base
+    if args.config_dir:
+        for n, simulator in enumerate(simulators):
+            simulator.config_store = ConfigStore(args.config_dir if len(simulators) == 1 else f"{args.config_dir}.{n}")
+    if args.record:
+        for n, simulator in enumerate(simulators):
+            simulator.recorder = TrafficRecorder(args.record if len(simulators) == 1 else f"{args.record}.{n}")
+    if args.metrics:
+        MetricsServer(simulators, args.metrics).start()
+    metrics_dumper = None
+    if args.metrics_dump:
+        metrics_dumper = MetricsDumper(simulators, args.metrics_dump, args.metrics_interval)
+        metrics_dumper.start()
+    try:
+        if len(simulators) > 1:
+            assert not args.concurrent, "Concurrent mode is only available for a single simulated receiver."
+            run_multiple(simulators)
+        elif args.concurrent:
+            simulators[0].run_concurrent()
+        else:
+            simulators[0].run()
+    finally:
+        if metrics_dumper is not None:
+            metrics_dumper.stop()
+        for simulator in simulators:
+            if simulator.recorder is not None:
+                simulator.recorder.close()
 
 
 if __name__ == '__main__':